@@ -0,0 +1,185 @@
+from typing import Any, Dict, Optional, Tuple, Union
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from app.config import settings
+from app.sql_utils import fingerprint_sql, strip_sql
+
+Bind = Union[AsyncEngine, AsyncConnection, AsyncSession]
+
+# Statements PostgreSQL can EXPLAIN without running them
+EXPLAINABLE_KEYWORDS = ("select", "with", "values", "table", "insert", "update", "delete", "merge")
+
+class QueryRejected(Exception):
+    """Raised when a statement's estimated cost is over the admission limits."""
+
+class AdmissionController:
+    """Admit, deprioritise or reject statements on the planner's cost and row estimates.
+
+    Plan estimates are cached by statement fingerprint (literals replaced by
+    placeholders), so repeated query shapes skip the EXPLAIN round-trip.
+    Low-priority statements share a small number of execution slots. A statement
+    that runs inside a request's transaction is explained there, so it sees the
+    transaction's own schema changes instead of waiting on their locks.
+    """
+
+    def __init__(self, reject_cost: float, reject_rows: float, low_priority_cost: float,
+                 low_priority_slots: int, plan_cache_size: int, plan_cache_ttl: float, explain_timeout_ms: int):
+        self.reject_cost = reject_cost
+        self.reject_rows = reject_rows
+        self.low_priority_cost = low_priority_cost
+        self.low_priority_slots = low_priority_slots
+        self.plan_cache_size = plan_cache_size
+        self.plan_cache_ttl = plan_cache_ttl
+        self.explain_timeout_ms = explain_timeout_ms
+        self._plans: "OrderedDict[str, Tuple[float, Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._slots = asyncio.Semaphore(max(low_priority_slots, 1))
+        self.counts = {"admitted": 0, "low_priority": 0, "rejected": 0, "unplanned": 0}
+        self.plan_cache_hits = 0
+        self.plan_cache_misses = 0
+        self.queued = 0
+        self.running_low_priority = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.reject_cost > 0 or self.reject_rows > 0 or self.low_priority_cost > 0
+
+    async def evaluate(self, bind: Bind, statement: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Classify a statement as admit, low_priority or reject from its (cached) plan estimate."""
+        if not self.enabled:
+            return {"action": "admit", "cost": None, "rows": None, "reason": None}
+        estimate = await self.estimate(bind, statement, params)
+        if estimate is None:
+            decision = {"action": "admit", "cost": None, "rows": None, "reason": None}
+            self._count("unplanned")
+            return decision
+        cost, rows = estimate["cost"], estimate["rows"]
+        decision = {"action": "admit", "cost": cost, "rows": rows, "reason": None}
+        if self.reject_cost > 0 and cost > self.reject_cost:
+            decision.update(action="reject", reason=f"estimated cost {cost:.0f} exceeds {self.reject_cost:.0f}")
+        elif self.reject_rows > 0 and rows > self.reject_rows:
+            decision.update(action="reject", reason=f"estimated rows {rows:.0f} exceed {self.reject_rows:.0f}")
+        elif self.low_priority_cost > 0 and cost > self.low_priority_cost:
+            decision.update(action="low_priority", reason=f"estimated cost {cost:.0f} exceeds {self.low_priority_cost:.0f}")
+        self._count("rejected" if decision["action"] == "reject" else
+                    "low_priority" if decision["action"] == "low_priority" else "admitted")
+        return decision
+
+    async def check(self, bind: Bind, statement: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Evaluate a statement and raise QueryRejected if it may not run."""
+        decision = await self.evaluate(bind, statement, params)
+        if decision["action"] == "reject":
+            raise QueryRejected(f"Query rejected by admission control: {decision['reason']}")
+        return decision
+
+    async def estimate(self, bind: Bind, statement: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, float]]:
+        """Return the planner's total cost and row estimate, or None for statements that cannot be explained.
+
+        bind is an engine, or the session or connection whose transaction the statement will run in.
+        """
+        stripped = strip_sql(statement)
+        if not stripped.startswith(EXPLAINABLE_KEYWORDS) or ";" in stripped:
+            return None
+        key = hashlib.sha1(fingerprint_sql(statement).encode()).hexdigest()
+        with self._lock:
+            entry = self._plans.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._plans.move_to_end(key)
+                self.plan_cache_hits += 1
+                return entry[1]
+            self.plan_cache_misses += 1
+        try:
+            plan = await self._explain(bind, statement, params)
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = {"cost": float(plan[0]["Plan"]["Total Cost"]), "rows": float(plan[0]["Plan"]["Plan Rows"])}
+        except SQLAlchemyError:
+            # Let the statement itself report the error; the next statement of this shape is explained again
+            return None
+        if self.plan_cache_size > 0:
+            with self._lock:
+                self._plans[key] = (time.monotonic() + self.plan_cache_ttl, estimate)
+                self._plans.move_to_end(key)
+                while len(self._plans) > self.plan_cache_size:
+                    self._plans.popitem(last=False)
+        return estimate
+
+    async def _explain(self, bind: Bind, statement: str, params: Optional[Dict[str, Any]]) -> Any:
+        explain = text(f"EXPLAIN (FORMAT JSON) {statement}")
+        if not isinstance(bind, AsyncEngine):
+            # A savepoint keeps a failed EXPLAIN from aborting the caller's transaction
+            async with bind.begin_nested():
+                return (await bind.execute(explain, params or {})).scalar()
+        async with bind.connect() as connection:
+            if self.explain_timeout_ms > 0:
+                # An estimate must never wait for long on another transaction's locks
+                await connection.execute(text(f"SET LOCAL lock_timeout = {int(self.explain_timeout_ms)}"))
+                await connection.execute(text(f"SET LOCAL statement_timeout = {int(self.explain_timeout_ms)}"))
+            return (await connection.execute(explain, params or {})).scalar()
+
+    @asynccontextmanager
+    async def slot(self, decision: Dict[str, Any]):
+        """Hold a low-priority execution slot while the statement runs; admitted statements pass straight through."""
+        if decision["action"] != "low_priority":
+            yield
+            return
+        with self._lock:
+            self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            with self._lock:
+                self.queued -= 1
+        with self._lock:
+            self.running_low_priority += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running_low_priority -= 1
+            self._slots.release()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.plan_cache_hits + self.plan_cache_misses
+            return {
+                "enabled": self.enabled,
+                "reject_cost": self.reject_cost,
+                "reject_rows": self.reject_rows,
+                "low_priority_cost": self.low_priority_cost,
+                "low_priority_slots": self.low_priority_slots,
+                **self.counts,
+                "queued": self.queued,
+                "running_low_priority": self.running_low_priority,
+                "plan_cache_entries": len(self._plans),
+                "plan_cache_hits": self.plan_cache_hits,
+                "plan_cache_misses": self.plan_cache_misses,
+                "plan_cache_hit_ratio": self.plan_cache_hits / lookups if lookups else 0.0,
+            }
+
+    def _count(self, action: str) -> None:
+        with self._lock:
+            self.counts[action] += 1
+
+# Shared admission controller instance
+admission = AdmissionController(
+    reject_cost=settings.admission_reject_cost,
+    reject_rows=settings.admission_reject_rows,
+    low_priority_cost=settings.admission_low_priority_cost,
+    low_priority_slots=settings.admission_low_priority_slots,
+    plan_cache_size=settings.admission_plan_cache_size,
+    plan_cache_ttl=settings.admission_plan_cache_ttl,
+    explain_timeout_ms=settings.admission_explain_timeout_ms
+)
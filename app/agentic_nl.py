@@ -1,134 +1,227 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from app.auth import get_current_active_user
 from app.models import User
 from app.config import settings
-from app.database import get_db
-from langchain_openai import ChatOpenAI
-from sqlalchemy.orm import Session
+from app.database import get_async_db
+from app.cache import result_cache
+from app.sql_utils import is_ddl, is_deterministic, is_read_only, referenced_tables, split_statements
+from app.governor import QueryLimits, collect_rows, limits_applied, limits_for, run_cancellable
+from app.admission import admission, QueryRejected
+from app.replicas import replica_router
+from app.batch import run_dependent, statement_dependencies
+from app.nl_cache import translation_cache
+from app.catalog import schema_catalog
+from app.nl_prompt import build_prompt
+from app.nl_rules import rule_translator
+from app.llm import LLMUnavailable, llm_gateway
+from app.streaming import SSE_MEDIA_TYPE, sse_event
+from app.encoders import RESULT_FORMATS, ARROW_MEDIA_TYPE, arrow_available, to_records, to_arrow_ipc
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import json
+import time
 
 router = APIRouter()
 
 class NLQuery(BaseModel):
     instruction: str
+    format: str = "json"  # json, columnar, arrow
 
-llm = ChatOpenAI(
-    model="gpt-3.5-turbo",
-    temperature=0,
-    api_key=settings.openai_api_key
-)
+async def _execute_statement(db: AsyncSession, q: str, limits: QueryLimits, user: str, in_transaction: bool,
+                             params: Optional[Dict[str, Any]] = None):
+    """Run one generated statement under the request's limits once admission control lets it in.
+
+    Writes, and reads that depend on an earlier write of the same request, run in
+    the request's transaction under a savepoint, so a failure only undoes that
+    statement. Other reads go to a replica unless the user wrote recently.
+    Returns (columns, rows, truncated_by, rowcount); rowcount is only set for
+    statements that do not return rows.
+    """
+    read_only = is_read_only(q)
+    engine = replica_router.engine_for(read_only and not in_transaction and is_deterministic(q), user)
+    # Statements in the request's transaction are explained there, behind its own locks
+    decision = await admission.check(db if in_transaction else engine, q, params)
+    async with admission.slot(decision):
+        if not in_transaction:
+            async with engine.connect() as connection, limits_applied(connection, limits):
+                result = await connection.stream(text(q), params, execution_options={"yield_per": settings.stream_chunk_size})
+                columns = list(result.keys())
+                rows, truncated = await collect_rows(result.partitions(), limits)
+                await result.close()
+            return columns, rows, truncated, None
+        async with limits_applied(db, limits), db.begin_nested():
+            if read_only:
+                result = await db.stream(text(q), params, execution_options={"yield_per": settings.stream_chunk_size})
+                columns = list(result.keys())
+                rows, truncated = await collect_rows(result.partitions(), limits)
+                await result.close()
+                return columns, rows, truncated, None
+            result = await db.execute(text(q), params)
+            if result.returns_rows:
+                return list(result.keys()), [tuple(row) for row in result], None, None
+            return [], [], None, result.rowcount
+
+def _format_result(result: dict, fmt: str) -> dict:
+    """Shape one statement result for a JSON response in the requested format."""
+    if fmt == "columnar":
+        return result
+    formatted = {k: v for k, v in result.items() if k not in ("columns", "rows")}
+    formatted["data"] = to_records(result["columns"], result["rows"])
+    return formatted
+
+async def _translate(instruction: str, user: str) -> Tuple[str, Optional[Dict[str, Any]], str, int]:
+    """Return (sql, params, translation, cache generation) for an instruction.
+
+    Simple instructions are translated by local rules, repeated ones come from the
+    cache, and only the rest are sent to the LLM. params is set for rule translations.
+    """
+    # Catalog and column statistics reads are read-only, so they can go to a replica too
+    engine = replica_router.read_engine(user)
+    await translation_cache.refresh(engine)
+    generation = translation_cache.generation
+    excluded = {name.strip() for name in settings.nl_excluded_tables.split(",") if name.strip()}
+    tables = {name: table for name, table in (await schema_catalog.snapshot(engine)).tables.items()
+              if name not in excluded}
+    translated = rule_translator.translate(instruction, tables)
+    if translated is not None:
+        return translated[0], translated[1], "rules", generation
+    # Repeated instructions, and ones that differ only in literals, skip the LLM
+    cached = translation_cache.get(instruction)
+    if cached is not None:
+        return cached[0], None, cached[1], generation
+    # Describe only the tables and columns the instruction needs
+    prompt = build_prompt(
+        instruction,
+        tables,
+        settings.nl_prompt_token_budget,
+        translation_cache.value_columns(instruction)
+    )
+    # Get SQL from LLM
+    response = await llm_gateway.complete(prompt, user)
+    return response.strip().split("\n")[0], None, "llm", generation
+
+async def _run_statements(db: AsyncSession, http_request: Request, sql_query: str, user: str,
+                          on_result: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None,
+                          params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run the generated statements in dependency order and commit their writes once.
+
+    params are the bind values of a rule translation, which is always a single
+    statement. on_result(index, result) is awaited as each statement finishes. Returns the
+    results in generated order with the elapsed, sequential and saved times.
+    """
+    queries = split_statements(sql_query)
+    writes = [not is_read_only(q) for q in queries]
+    dependencies = statement_dependencies(queries)
+    # Statements sharing the request's transaction take turns on its session
+    in_transaction = [writes[j] or any(writes[i] for i in dependencies[j]) for j in range(len(queries))]
+    session_lock = asyncio.Lock()
+
+    async def run(index: int, q: str):
+        limits = limits_for(user)
+        try:
+            work = _execute_statement(db, q, limits, user, in_transaction[index], params)
+            if in_transaction[index]:
+                async with session_lock:
+                    columns, rows, truncated, rowcount = await run_cancellable(http_request, limits, work)
+            else:
+                columns, rows, truncated, rowcount = await run_cancellable(http_request, limits, work)
+            if rowcount is None:
+                message = f"Query executed successfully. Retrieved {len(rows)} rows."
+                if truncated:
+                    message += f" Result truncated by the {truncated} limit."
+                return {
+                    "sql": q,
+                    "columns": columns,
+                    "rows": rows,
+                    "message": message,
+                    "error": None
+                }
+            return {
+                "sql": q,
+                "columns": [],
+                "rows": [],
+                "message": f"Query executed successfully. {rowcount} rows affected.",
+                "error": None
+            }
+        except QueryRejected as e:
+            return {
+                "sql": q,
+                "columns": [],
+                "rows": [],
+                "message": str(e),
+                "error": str(e)
+            }
+        except SQLAlchemyError as e:
+            return {
+                "sql": q,
+                "columns": [],
+                "rows": [],
+                "message": f"Database error: {str(e)}",
+                "error": str(e)
+            }
+
+    # Independent statements run concurrently; the response keeps the generated order
+    start = time.perf_counter()
+    results = await run_dependent(queries, run, settings.nl_parallelism, on_result)
+    written = [q for q, write, r in zip(queries, writes, results) if write and r["error"] is None]
+    if written:
+        # One commit for the whole instruction
+        if not settings.nl_synchronous_commit:
+            await db.execute(text("SET LOCAL synchronous_commit = off"))
+        await db.commit()
+        result_cache.invalidate_tables({table for q in written for table in referenced_tables(q)})
+        replica_router.record_write(user)
+        if any(is_ddl(q) for q in written):
+            schema_catalog.expire()
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+    sequential_ms = round(sum(r["elapsed_ms"] for r in results), 3)
+    return {
+        "results": results,
+        "elapsed_ms": elapsed_ms,
+        "sequential_ms": sequential_ms,
+        "saved_ms": round(max(sequential_ms - elapsed_ms, 0), 3),
+    }
 
 @router.post("/agent/nl_query")
 async def agent_nl_query(
     request: NLQuery,
-    db: Session = Depends(get_db),
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Accepts a natural language instruction, uses LLM to generate SQL, executes it, and returns the result.
+    With format=arrow the rows of the last statement that returned rows are sent as an Arrow IPC stream.
     """
-    prompt = f"""
-You are a highly reliable and safe AI SQL assistant for a PostgreSQL database.
-
-Database schema:
-- Table 'employees':
-    - id (integer, primary key)
-    - name (string)
-    - email (string)
-    - department (string)
-    - salary (decimal)
-    - hire_date (date)
-- Table 'products':
-    - id (integer, primary key)
-    - name (string)
-    - category (string)
-    - price (decimal)
-    - stock_quantity (integer)
-    - created_at (timestamp)
-- Table 'orders':
-    - id (integer, primary key)
-    - customer_name (string)
-    - product_id (integer, foreign key to products.id)
-    - quantity (integer)
-    - total_amount (decimal)
-    - order_date (timestamp)
-
-Instructions:
-- Convert the following natural language instruction into valid SQL query or queries using ONLY the tables and columns listed above.
-- If the instruction contains multiple steps, output the SQL queries needed, separated by semicolons, in the correct order.
-- Never generate queries that drop tables, alter schema, or delete all records (always require a WHERE clause for DELETE).
-- Do not use columns or tables that are not listed in the schema.
-- Only output the SQL query or queries, do not include explanations, comments, or any extra text.
-- Use single quotes for string values.
-- If the instruction is not possible with the schema, output a SELECT statement that returns no rows (e.g., SELECT * FROM employees WHERE 1=0;).
-
-Examples:
-Instruction: Add a new employee named Alice Smith with email alice@example.com, department HR, and salary 70000.
-SQL: INSERT INTO employees (name, email, department, salary) VALUES ('Alice Smith', 'alice@example.com', 'HR', 70000);
-
-Instruction: Show all employees in the IT department.
-SQL: SELECT * FROM employees WHERE department = 'IT';
-
-Instruction: Add a new product named "Monitor" in category "Electronics" with price 199.99 and stock 20.
-SQL: INSERT INTO products (name, category, price, stock_quantity) VALUES ('Monitor', 'Electronics', 199.99, 20);
-
-Instruction: Show all orders for customer Alice Brown.
-SQL: SELECT * FROM orders WHERE customer_name = 'Alice Brown';
-
-Instruction: Add a new employee named Bob Lee with email bob@example.com, department IT, and salary 80000, then show all employees.
-SQL: INSERT INTO employees (name, email, department, salary) VALUES ('Bob Lee', 'bob@example.com', 'IT', 80000); SELECT * FROM employees;
-
-Instruction: Remove all employees (should be prevented).
-SQL: SELECT * FROM employees WHERE 1=0;
-
-Instruction: Drop the employees table (should be prevented).
-SQL: SELECT * FROM employees WHERE 1=0;
-
-Instruction: {request.instruction}
-SQL:
-"""
+    fmt = request.format.lower()
+    if fmt not in RESULT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format. Must be json, columnar, or arrow")
+    if fmt == "arrow" and not arrow_available():
+        raise HTTPException(status_code=400, detail="The arrow format requires pyarrow to be installed")
     try:
-        # Get SQL from LLM
-        response = llm.invoke(prompt)
-        sql_query = response.content.strip().split("\n")[0]
+        sql_query, params, translation, generation = await _translate(request.instruction, current_user.username)
         # Execute SQL
         try:
-            queries = [q.strip() for q in sql_query.split(';') if q.strip()]
-            results = []
-            for q in queries:
-                try:
-                    result = db.execute(text(q))
-                    if q.lower().startswith(("insert", "update", "delete")):
-                        db.commit()
-                    if result.returns_rows:
-                        rows = [dict(row._mapping) for row in result]
-                        results.append({
-                            "sql": q,
-                            "data": rows,
-                            "message": f"Query executed successfully. Retrieved {len(rows)} rows.",
-                            "error": None
-                        })
-                    else:
-                        results.append({
-                            "sql": q,
-                            "data": [],
-                            "message": f"Query executed successfully. {result.rowcount} rows affected.",
-                            "error": None
-                        })
-                except SQLAlchemyError as e:
-                    results.append({
-                        "sql": q,
-                        "data": [],
-                        "message": f"Database error: {str(e)}",
-                        "error": str(e)
-                    })
+            run = await _run_statements(db, http_request, sql_query, current_user.username, params=params)
+            results = run.pop("results")
+            if translation == "llm" and all(r["error"] is None for r in results):
+                translation_cache.put(request.instruction, sql_query, generation)
+            if fmt == "arrow":
+                tables = [r for r in results if r["columns"]]
+                if tables:
+                    return Response(to_arrow_ipc(tables[-1]["columns"], tables[-1]["rows"]), media_type=ARROW_MEDIA_TYPE)
             return {
                 "success": all(r["error"] is None for r in results),
                 "sql": sql_query,
-                "results": results,
+                "params": params,
+                "translation": translation,
+                "results": [_format_result(r, fmt) for r in results],
+                **run,
                 "message": "All queries executed. See results for details."
             }
         except Exception as e:
@@ -138,5 +231,75 @@ SQL:
                 "results": [],
                 "message": f"Execution error: {str(e)}"
             }
+    except LLMUnavailable as e:
+        # Only cached and rule translations are served while the LLM is down
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"No cached or local translation for this instruction, and the LLM is unavailable: {str(e)}",
+            headers={"Retry-After": str(max(int(llm_gateway.breaker.retry_after), 1))}
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM or execution error: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"LLM or execution error: {str(e)}")
+
+@router.post("/agent/nl_query/events")
+async def agent_nl_query_events(
+    request: NLQuery,
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Like /agent/nl_query, but answers with Server-Sent Events: an sql event as soon as the SQL
+    is known, a result event per statement as soon as it has run, then a done event.
+    """
+    fmt = request.format.lower()
+    if fmt not in ("json", "columnar"):
+        raise HTTPException(status_code=400, detail="Invalid format. Must be json or columnar")
+
+    async def events():
+        try:
+            sql_query, params, translation, generation = await _translate(request.instruction, current_user.username)
+        except Exception as e:
+            yield sse_event("error", {"message": f"LLM error: {str(e)}"})
+            return
+        yield sse_event("sql", {"sql": sql_query, "params": params, "translation": translation})
+
+        finished: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(_run_statements(
+            db, http_request, sql_query, current_user.username,
+            lambda index, result: finished.put((index, result)),
+            params
+        ))
+        task.add_done_callback(lambda _: finished.put_nowait(None))
+        try:
+            while True:
+                item = await finished.get()
+                if item is None:
+                    break
+                index, result = item
+                yield sse_event("result", {"index": index, **_format_result(result, fmt)})
+            run = await task
+        except Exception as e:
+            yield sse_event("error", {"message": f"Execution error: {str(e)}"})
+            return
+        finally:
+            # The client went away before the statements finished
+            if not task.done():
+                task.cancel()
+        results = run.pop("results")
+        success = all(r["error"] is None for r in results)
+        if translation == "llm" and success:
+            translation_cache.put(request.instruction, sql_query, generation)
+        yield sse_event("done", {"success": success, **run})
+
+    return StreamingResponse(events(), media_type=SSE_MEDIA_TYPE)
+
+@router.get("/agent/nl_cache/stats")
+async def get_nl_cache_stats(current_user: User = Depends(get_current_active_user)):
+    """Hit, miss and size counters of the NL translation cache."""
+    return translation_cache.stats()
+
+@router.get("/agent/nl_rules/stats")
+async def get_nl_rules_stats(current_user: User = Depends(get_current_active_user)):
+    """Hit rate of the local rule translator and the LLM time it saved."""
+    return rule_translator.stats()
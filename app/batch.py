@@ -0,0 +1,96 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import time
+from app.sql_utils import is_read_only, referenced_tables
+
+async def _timed(run: Callable[[int, str], Awaitable[Dict[str, Any]]], index: int, statement: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        result = await run(index, statement)
+    except Exception as e:
+        result = {"success": False, "columns": [], "rows": [], "message": f"Error: {str(e)}"}
+    # The result may be a dict shared through the result cache, so it is copied
+    return {**result, "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+async def run_batch(statements: List[str], run: Callable[[int, str], Awaitable[Dict[str, Any]]],
+                    parallelism: int) -> List[Dict[str, Any]]:
+    """Run statements with run(index, statement) and return their results in input order.
+
+    Consecutive read-only statements run concurrently, at most parallelism at a time;
+    any other statement runs alone, after everything before it and before everything
+    after it. Each result gets its elapsed_ms.
+    """
+    results: List[Dict[str, Any]] = [{} for _ in statements]
+    semaphore = asyncio.Semaphore(max(parallelism, 1))
+
+    async def limited(index: int, statement: str) -> None:
+        async with semaphore:
+            results[index] = await _timed(run, index, statement)
+
+    group: List[int] = []
+    for index, statement in enumerate(statements + [None]):
+        if statement is not None and is_read_only(statement):
+            group.append(index)
+            continue
+        if group:
+            await asyncio.gather(*(limited(i, statements[i]) for i in group))
+            group = []
+        if statement is not None:
+            results[index] = await _timed(run, index, statement)
+    return results
+
+def statement_dependencies(statements: List[str]) -> List[Set[int]]:
+    """For each statement, the earlier statements it must wait for.
+
+    Statements conflict when one writes a table the other reads or writes; all
+    writes also keep their original order among themselves. A write whose tables
+    cannot be determined (DDL, function calls) is a barrier for everything around it.
+    """
+    read_only = [is_read_only(statement) for statement in statements]
+    tables = [set(referenced_tables(statement)) for statement in statements]
+    dependencies: List[Set[int]] = []
+    for j, statement in enumerate(statements):
+        waits = set()
+        for i in range(j):
+            if not read_only[i] and not read_only[j]:
+                waits.add(i)
+            elif not read_only[i] or not read_only[j]:
+                writer = i if not read_only[i] else j
+                if not tables[writer] or tables[i] & tables[j]:
+                    waits.add(i)
+        dependencies.append(waits)
+    return dependencies
+
+async def run_dependent(statements: List[str], run: Callable[[int, str], Awaitable[Dict[str, Any]]],
+                        parallelism: int,
+                        on_result: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None) -> List[Dict[str, Any]]:
+    """Run statements as soon as the statements they depend on have finished.
+
+    Independent statements run concurrently, at most parallelism at a time. Results
+    come back in input order, each with its elapsed_ms; on_result(index, result) is
+    awaited as each one finishes. An exception from run cancels the remaining
+    statements and is raised.
+    """
+    dependencies = statement_dependencies(statements)
+    done = [asyncio.Event() for _ in statements]
+    results: List[Dict[str, Any]] = [{} for _ in statements]
+    semaphore = asyncio.Semaphore(max(parallelism, 1))
+
+    async def schedule(index: int) -> None:
+        for dependency in dependencies[index]:
+            await done[dependency].wait()
+        async with semaphore:
+            start = time.perf_counter()
+            results[index] = await run(index, statements[index])
+            results[index]["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        done[index].set()
+        if on_result is not None:
+            await on_result(index, results[index])
+
+    tasks = [asyncio.ensure_future(schedule(i)) for i in range(len(statements))]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return results
@@ -0,0 +1,254 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import codecs
+import csv
+import json
+import time
+import zlib
+from sqlalchemy import Table
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import settings
+from app.governor import release_limits
+from app.statements import reflect_table, coerce_value
+
+IMPORT_FORMATS = ("csv", "ndjson")
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "binary": "application/octet-stream",
+}
+_DONE = object()
+
+class ImportStats:
+    """Counters of one COPY import, filled in while the body streams through."""
+
+    def __init__(self):
+        self.rows = 0
+        self.rejected = 0
+        self.rejected_lines: List[Dict[str, Any]] = []
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.rejected_lines) < settings.import_max_reported_rejects:
+            self.rejected_lines.append({"line": line, "error": error})
+
+async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream as UTF-8 and yield it line by line, newline included."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in body:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+async def _csv_records(body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, List[str]]]:
+    """Yield (line number, fields) per CSV record; quoted fields may span lines."""
+    record, start, number = "", 0, 0
+    async for line in _lines(body):
+        number += 1
+        if not record:
+            start = number
+        record += line
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2:
+            continue
+        if record.strip():
+            yield start, next(csv.reader([record]))
+        record = ""
+    if record.strip():
+        yield start, next(csv.reader([record]))
+
+async def _ndjson_records(body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    number = 0
+    async for line in _lines(body):
+        number += 1
+        if line.strip():
+            yield number, line
+
+def _check_columns(table: Table, columns: Sequence[str]) -> None:
+    unknown = [column for column in columns if column not in table.c]
+    if unknown:
+        raise ValueError(f"Unknown column {unknown[0]!r} in table {table.name!r}")
+    if len(set(columns)) != len(columns):
+        raise ValueError("Duplicate column in import header")
+
+def _validate(table: Table, columns: Sequence[str], values: Sequence[Any]) -> List[Any]:
+    """Convert one record's values to the column types, raising ValueError for a bad record."""
+    row = []
+    for column, value in zip(columns, values):
+        if value is None and not table.c[column].nullable and table.c[column].server_default is None:
+            raise ValueError(f"Column {column!r} cannot be null")
+        value = coerce_value(table, column, value)
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        row.append(value)
+    return row
+
+def _csv_field(value: Any) -> str:
+    # COPY CSV reads an unquoted empty field as NULL and a quoted one as an empty string
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+def _encode(rows: List[List[Any]]) -> bytes:
+    return "".join(",".join(_csv_field(value) for value in row) + "\n" for row in rows).encode()
+
+async def _copy_source(table: Table, records: AsyncIterator[Tuple[int, Any]], columns: List[str], fmt: str,
+                       stats: ImportStats) -> AsyncIterator[bytes]:
+    """Validate records and re-encode the good ones as CSV chunks for COPY."""
+    batch: List[List[Any]] = []
+    async for number, record in records:
+        try:
+            if fmt == "ndjson":
+                try:
+                    record = json.loads(record)
+                except ValueError:
+                    raise ValueError("Invalid JSON")
+                if not isinstance(record, dict):
+                    raise ValueError("Expected a JSON object")
+                extra = [key for key in record if key not in columns]
+                if extra:
+                    raise ValueError(f"Unexpected column {extra[0]!r}")
+                values = [record.get(column) for column in columns]
+            else:
+                if len(record) != len(columns):
+                    raise ValueError(f"Expected {len(columns)} fields, got {len(record)}")
+                # An empty CSV field is NULL, as COPY would read it
+                values = [value if value != "" else None for value in record]
+            batch.append(_validate(table, columns, values))
+        except ValueError as e:
+            stats.reject(number, str(e))
+            continue
+        stats.rows += 1
+        if len(batch) >= settings.stream_chunk_size:
+            yield _encode(batch)
+            batch = []
+    if batch:
+        yield _encode(batch)
+
+async def copy_from_stream(engine: AsyncEngine, table: str, body: AsyncIterator[bytes], fmt: str = "csv",
+                           columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Stream a CSV or NDJSON body into COPY table (columns) FROM STDIN in one transaction.
+
+    CSV columns come from the header line unless given; NDJSON columns default to the
+    keys of the first object. Bad lines are rejected and reported, the rest are loaded.
+    """
+    reflected = await reflect_table(engine, table)
+    if fmt == "csv":
+        records = _csv_records(body)
+        if not columns:
+            try:
+                _, columns = await records.__anext__()
+            except StopAsyncIteration:
+                raise ValueError("The CSV body is empty")
+    else:
+        records = _ndjson_records(body)
+        if not columns:
+            try:
+                first = await records.__anext__()
+            except StopAsyncIteration:
+                raise ValueError("The NDJSON body is empty")
+            try:
+                columns = list(json.loads(first[1]))
+            except (ValueError, TypeError):
+                raise ValueError("The first NDJSON line must be a JSON object")
+            records = _prepend(first, records)
+    columns = [column.strip() for column in columns]
+    _check_columns(reflected, columns)
+
+    stats = ImportStats()
+    start = time.perf_counter()
+    async with engine.connect() as connection:
+        raw = (await connection.get_raw_connection()).driver_connection
+        async with raw.transaction():
+            await raw.copy_to_table(
+                reflected.name,
+                schema_name=reflected.schema,
+                columns=columns,
+                source=_copy_source(reflected, records, columns, fmt, stats),
+                format="csv"
+            )
+    elapsed = time.perf_counter() - start
+    return {
+        "success": True,
+        "message": f"Imported {stats.rows} rows into {reflected.name}, rejected {stats.rejected} lines",
+        "table": reflected.name,
+        "columns": columns,
+        "rows_imported": stats.rows,
+        "rows_rejected": stats.rejected,
+        "rejected_lines": stats.rejected_lines,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(stats.rows / elapsed, 1) if elapsed > 0 else None,
+    }
+
+async def _prepend(first: Tuple[int, Any], rest: AsyncIterator[Tuple[int, Any]]) -> AsyncIterator[Tuple[int, Any]]:
+    yield first
+    async for item in rest:
+        yield item
+
+async def copy_to_stream(engine: AsyncEngine, query: str, fmt: str = "csv", compress: bool = False,
+                         limits=None) -> AsyncIterator[bytes]:
+    """Run COPY (query) TO STDOUT in a read-only transaction and return an iterator of its chunks.
+
+    The first chunk is awaited before returning so that errors are raised while a
+    status code can still be sent. A bounded queue applies back-pressure to the
+    server when the client reads slowly; closing the iterator cancels the COPY.
+    """
+    connection = await engine.connect()
+    raw = (await connection.get_raw_connection()).driver_connection
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=settings.export_queue_chunks)
+
+    async def run():
+        try:
+            async with raw.transaction(readonly=True):
+                if limits is not None:
+                    if limits.statement_timeout_ms > 0:
+                        await raw.execute(f"SET LOCAL statement_timeout = {int(limits.statement_timeout_ms)}")
+                    limits.backend_pid = raw.get_server_pid()
+                    limits.backend_engine = engine
+                # Let the server parse the query on its own first, so text that only
+                # becomes valid once wrapped in COPY ( ... ) is rejected
+                await raw.prepare(query.strip().rstrip(";"))
+                # asyncpg may reuse its buffer, so every chunk is copied before it is queued
+                await raw.copy_from_query(query.strip().rstrip(";"), output=lambda chunk: chunks.put(bytes(chunk)),
+                                          format=fmt, header=fmt == "csv")
+        except Exception:
+            await chunks.put(_DONE)
+            raise
+        finally:
+            release_limits(limits)
+        await chunks.put(_DONE)
+
+    task = asyncio.ensure_future(run())
+    try:
+        first = await chunks.get()
+        if first is _DONE:
+            await task
+    except BaseException:
+        task.cancel()
+        await connection.close()
+        raise
+    return _drain(connection, task, chunks, first, compress)
+
+async def _drain(connection, task: "asyncio.Future", chunks: asyncio.Queue, first: Any, compress: bool) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    try:
+        chunk = first
+        while chunk is not _DONE:
+            yield compressor.compress(chunk) if compressor else chunk
+            chunk = await chunks.get()
+        await task
+        if compressor:
+            yield compressor.flush()
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+        await connection.close()
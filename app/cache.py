@@ -0,0 +1,147 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from collections import OrderedDict
+import json
+import sys
+import threading
+import time
+from app.config import settings
+from app.sql_utils import normalize_sql
+
+def make_cache_key(query: str, *params: Any) -> str:
+    """Key a read on its normalized SQL plus everything else that shapes the result."""
+    return normalize_sql(query) + "\x00" + json.dumps(params, sort_keys=True, default=str)
+
+def estimate_size(value: Dict[str, Any]) -> int:
+    """Rough in-memory size of a result dict with columns and tuple rows."""
+    rows = value.get("rows") or []
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(c) for c in value.get("columns") or [])
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row)
+    return size
+
+class ResultCache:
+    """Bounded LRU cache of read-only query results with a TTL and per-table invalidation.
+
+    Each table has a generation counter that writes bump, so a read that started
+    before a write to one of its tables is never stored after the invalidation.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, int, Tuple[str, ...], Any]]" = OrderedDict()
+        self._by_table: Dict[str, set] = {}
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+
+    def put(self, key: str, value: Any, tables: Iterable[str], generation: Optional[Tuple[int, ...]] = None) -> None:
+        tables = tuple(tables)
+        size = estimate_size(value)
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation_of(tables):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, tables, value)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    async def get_or_load(self, key: str, tables: Iterable[str], loader: Callable[[], Awaitable[Dict[str, Any]]],
+                          refresh: bool = False) -> Dict[str, Any]:
+        """Return the cached result or await the loader and cache it if it succeeded.
+
+        refresh skips the lookup, e.g. for a user who must read their own writes
+        while an entry may have been loaded from a lagging replica.
+        """
+        if not self.enabled:
+            return await loader()
+        value = None if refresh else self.get(key)
+        if value is not None:
+            return value
+        tables = tuple(tables)
+        with self._lock:
+            generation = self._generation_of(tables)
+        value = await loader()
+        if value.get("success"):
+            self.put(key, value, tables, generation)
+        return value
+
+    def invalidate_tables(self, tables: Iterable[str]) -> None:
+        """Drop every entry that read one of the given tables."""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._by_table.pop(table, ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _generation_of(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(table, 0) for table in tables)
+
+    def _remove(self, key: str) -> None:
+        _, size, tables, _ = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+# Shared result cache instance
+result_cache = ResultCache(
+    max_entries=settings.result_cache_max_entries,
+    max_bytes=settings.result_cache_max_bytes,
+    ttl_seconds=settings.result_cache_ttl_seconds
+)
@@ -0,0 +1,229 @@
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+from types import MappingProxyType
+import asyncio
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import settings
+from app.sql_utils import is_identifier
+from app.statements import forget_tables
+from app.pagination import forget_primary_keys
+
+# Every column of every user table and view, in column order
+COLUMNS_QUERY = """
+SELECT n.nspname, c.relname, c.relkind::text, n.nspname = current_schema() AS visible,
+       a.attname, format_type(a.atttypid, a.atttypmod), NOT a.attnotnull, pg_get_expr(d.adbin, d.adrelid)
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+LEFT JOIN pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f')
+  AND n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'
+  AND NOT c.relispartition
+ORDER BY n.nspname, c.relname, a.attnum
+"""
+
+# Primary keys, foreign keys and indexes with their columns in key order
+KEYS_QUERY = """
+SELECT n.nspname, c.relname, con.contype::text, con.conname,
+       ARRAY(SELECT a.attname FROM unnest(con.conkey) WITH ORDINALITY k(attnum, ord)
+             JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum ORDER BY k.ord),
+       fn.nspname, fc.relname,
+       ARRAY(SELECT a.attname FROM unnest(con.confkey) WITH ORDINALITY k(attnum, ord)
+             JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum ORDER BY k.ord),
+       NULL::boolean, NULL::text
+FROM pg_constraint con
+JOIN pg_class c ON c.oid = con.conrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_class fc ON fc.oid = con.confrelid
+LEFT JOIN pg_namespace fn ON fn.oid = fc.relnamespace
+WHERE con.contype IN ('p', 'f')
+  AND n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'
+UNION ALL
+SELECT n.nspname, c.relname, 'i', ic.relname,
+       ARRAY(SELECT a.attname FROM unnest(i.indkey::int2[]) WITH ORDINALITY k(attnum, ord)
+             JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum ORDER BY k.ord),
+       NULL, NULL, NULL, i.indisunique, pg_get_indexdef(i.indexrelid)
+FROM pg_index i
+JOIN pg_class ic ON ic.oid = i.indexrelid
+JOIN pg_class c ON c.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'
+ORDER BY 1, 2, 4
+"""
+
+# Cheap hash of everything the catalog holds; any DDL on user tables, keys or indexes changes it
+FINGERPRINT_QUERY = """
+SELECT md5(COALESCE(string_agg(item, ',' ORDER BY item), '')) FROM (
+    SELECT concat_ws(':', c.oid, n.nspname, c.relname, c.relkind, a.attnum, a.attname, a.atttypid, a.atttypmod,
+                     a.attnotnull, a.atthasdef) AS item
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f')
+      AND n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'
+    UNION ALL
+    SELECT concat_ws(':', con.oid, con.conname, con.conrelid)
+    FROM pg_constraint con
+    JOIN pg_namespace n ON n.oid = con.connamespace
+    WHERE n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'
+    UNION ALL
+    SELECT concat_ws(':', i.indexrelid, i.indrelid)
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'
+) items
+"""
+
+class ColumnInfo(NamedTuple):
+    name: str
+    data_type: str
+    nullable: bool
+    default: Optional[str]
+
+class ForeignKey(NamedTuple):
+    columns: Tuple[str, ...]
+    ref_table: str
+    ref_columns: Tuple[str, ...]
+
+class IndexInfo(NamedTuple):
+    name: str
+    columns: Tuple[str, ...]  # empty for expression-only indexes; see definition
+    unique: bool
+    definition: str
+
+class TableInfo(NamedTuple):
+    """One table or view. name is schema-qualified unless the table is in the current schema."""
+    name: str
+    schema: str
+    kind: str  # table, view
+    columns: Tuple[ColumnInfo, ...]
+    primary_key: Tuple[str, ...]
+    foreign_keys: Tuple[ForeignKey, ...]
+    indexes: Tuple[IndexInfo, ...]
+
+    def column(self, name: str) -> Optional[ColumnInfo]:
+        return next((column for column in self.columns if column.name == name), None)
+
+class Catalog(NamedTuple):
+    """An immutable snapshot of the schema; a new one replaces it when the fingerprint changes."""
+    fingerprint: Optional[str]
+    tables: Mapping[str, TableInfo]
+    loaded_at: float
+
+    def table(self, name: str) -> Optional[TableInfo]:
+        """Look a table up by name, folding unquoted identifiers to lower case as SQL does."""
+        if name in self.tables:
+            return self.tables[name]
+        schema, table = [part.lower() if is_identifier(part) else part for part in name.rpartition(".")[::2]]
+        found = self.tables.get(f"{schema}.{table}" if schema else table)
+        if found is None and schema:
+            # Tables of the current schema are listed without their schema
+            found = self.tables.get(table)
+            if found is not None and found.schema != schema:
+                found = None
+        return found
+
+def _display_name(schema: str, table: str, visible: bool) -> str:
+    return table if visible else f"{schema}.{table}"
+
+async def load_catalog(engine: AsyncEngine) -> Catalog:
+    """Introspect every table, column, key and index in two catalog queries."""
+    async with engine.connect() as connection:
+        fingerprint = (await connection.execute(text(FINGERPRINT_QUERY))).scalar()
+        column_rows = (await connection.execute(text(COLUMNS_QUERY))).all()
+        key_rows = (await connection.execute(text(KEYS_QUERY))).all()
+
+    names: Dict[Tuple[str, str], str] = {}
+    columns: Dict[str, list] = {}
+    kinds: Dict[str, str] = {}
+    for schema, table, relkind, visible, column, data_type, nullable, default in column_rows:
+        name = names.setdefault((schema, table), _display_name(schema, table, visible))
+        kinds[name] = "view" if relkind in ("v", "m") else "table"
+        columns.setdefault(name, []).append(ColumnInfo(column, data_type, nullable, default))
+
+    primary_keys: Dict[str, Tuple[str, ...]] = {}
+    foreign_keys: Dict[str, list] = {}
+    indexes: Dict[str, list] = {}
+    for schema, table, kind, key_name, key_columns, ref_schema, ref_table, ref_columns, unique, definition in key_rows:
+        name = names.get((schema, table))
+        if name is None:
+            continue
+        if kind == "p":
+            primary_keys[name] = tuple(key_columns)
+        elif kind == "f":
+            if (ref_schema, ref_table) in names:
+                foreign_keys.setdefault(name, []).append(
+                    ForeignKey(tuple(key_columns), names[(ref_schema, ref_table)], tuple(ref_columns))
+                )
+        else:
+            indexes.setdefault(name, []).append(IndexInfo(key_name, tuple(key_columns), unique, definition))
+
+    tables = {
+        name: TableInfo(
+            name=name,
+            schema=schema,
+            kind=kinds[name],
+            columns=tuple(columns[name]),
+            primary_key=primary_keys.get(name, ()),
+            foreign_keys=tuple(foreign_keys.get(name, ())),
+            indexes=tuple(indexes.get(name, ())),
+        )
+        for (schema, _), name in sorted(names.items(), key=lambda item: item[1])
+    }
+    return Catalog(fingerprint, MappingProxyType(tables), time.time())
+
+class SchemaCatalog:
+    """Serve the schema from an in-memory snapshot, reloading it only when the schema changes.
+
+    The fingerprint is checked at most every check_seconds; expire() forces a check
+    on the next access, e.g. after DDL run through this process. A reload also
+    drops the reflected tables and statements cached for CRUD and the primary keys
+    cached for paging.
+    """
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._catalog = Catalog(None, MappingProxyType({}), 0.0)
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self.checks = 0
+        self.reloads = 0
+
+    async def snapshot(self, engine: AsyncEngine) -> Catalog:
+        if time.monotonic() - self._checked_at < self.check_seconds:
+            return self._catalog
+        async with self._lock:
+            if time.monotonic() - self._checked_at >= self.check_seconds:
+                async with engine.connect() as connection:
+                    fingerprint = (await connection.execute(text(FINGERPRINT_QUERY))).scalar()
+                self.checks += 1
+                if fingerprint != self._catalog.fingerprint:
+                    had_catalog = self._catalog.fingerprint is not None
+                    self._catalog = await load_catalog(engine)
+                    self.reloads += 1
+                    if had_catalog:
+                        forget_tables()
+                        forget_primary_keys()
+                self._checked_at = time.monotonic()
+        return self._catalog
+
+    def expire(self) -> None:
+        """Check the fingerprint on the next access and drop reflected tables and cached primary keys."""
+        self._checked_at = float("-inf")
+        forget_tables()
+        forget_primary_keys()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self._catalog.fingerprint,
+            "tables": len(self._catalog.tables),
+            "loaded_at": self._catalog.loaded_at or None,
+            "check_seconds": self.check_seconds,
+            "checks": self.checks,
+            "reloads": self.reloads,
+        }
+
+# Shared catalog instance
+schema_catalog = SchemaCatalog(check_seconds=settings.schema_catalog_check_seconds)
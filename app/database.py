@@ -1,10 +1,136 @@
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
 
-engine = create_engine(settings.database_url)
+def async_database_url(url: str):
+    """Point a postgresql:// URL at the asyncpg driver, translating sslmode to asyncpg's ssl.
+
+    Each connection keeps up to DB_PREPARED_STATEMENT_CACHE_SIZE server-side prepared
+    statements (0 disables them, e.g. behind a transaction-pooling PgBouncer).
+    """
+    parsed = make_url(url)
+    if parsed.drivername in ("postgres", "postgresql", "postgresql+psycopg2"):
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    query = dict(parsed.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    query.setdefault("prepared_statement_cache_size", str(settings.db_prepared_statement_cache_size))
+    return parsed.set(query=query)
+
+class _PoolWaitStats:
+    """Checkout counters shared by the timed pool classes."""
+
+    def _init_wait_stats(self):
+        self.wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _timed_get(self, get):
+        start = time.perf_counter()
+        try:
+            return get()
+        except PoolTimeoutError:
+            with self.wait_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self.wait_lock:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+class TimedQueuePool(_PoolWaitStats, QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_wait_stats()
+
+    def _do_get(self):
+        return self._timed_get(super()._do_get)
+
+class TimedAsyncQueuePool(_PoolWaitStats, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_wait_stats()
+
+    def _do_get(self):
+        return self._timed_get(super()._do_get)
+
+# Every module gets its engines from this registry so each worker holds one pool per database
+_engines: Dict[Tuple[str, str], Any] = {}
+_engines_lock = threading.Lock()
+
+def _pool_options() -> Dict[str, Any]:
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "query_cache_size": settings.db_query_cache_size,
+    }
+
+def get_engine(url: Optional[str] = None):
+    """Return the shared synchronous engine for a database URL (the primary by default)."""
+    url = url or settings.database_url
+    with _engines_lock:
+        if ("sync", url) not in _engines:
+            _engines[("sync", url)] = create_engine(url, poolclass=TimedQueuePool, **_pool_options())
+        return _engines[("sync", url)]
+
+def get_async_engine(url: Optional[str] = None):
+    """Return the shared async engine for a database URL (the primary by default)."""
+    url = url or settings.database_url
+    with _engines_lock:
+        if ("async", url) not in _engines:
+            _engines[("async", url)] = create_async_engine(
+                async_database_url(url), poolclass=TimedAsyncQueuePool, **_pool_options()
+            )
+        return _engines[("async", url)]
+
+def pool_stats() -> List[Dict[str, Any]]:
+    """Live connection pool statistics for every registered engine."""
+    with _engines_lock:
+        engines = list(_engines.items())
+    stats = []
+    for (kind, url), registered in engines:
+        pool = registered.pool
+        with pool.wait_lock:
+            checkouts, timeouts = pool.checkouts, pool.timeouts
+            wait_total, wait_max = pool.wait_seconds_total, pool.wait_seconds_max
+        stats.append({
+            "engine": kind,
+            "url": make_url(url).render_as_string(hide_password=True),
+            "pool_size": pool.size(),
+            "max_overflow": settings.db_max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "wait_ms_avg": round(wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+            "wait_ms_max": round(wait_max * 1000, 3),
+        })
+    return stats
+
+# Synchronous engine for DDL at startup and maintenance scripts
+engine = get_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine used by every request handler
+async_engine = get_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -12,4 +138,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
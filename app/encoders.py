@@ -0,0 +1,29 @@
+from typing import Any, Dict, List, Sequence
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pyarrow is optional and only needed for the arrow format
+    pa = None
+
+RESULT_FORMATS = ("json", "columnar", "arrow")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def arrow_available() -> bool:
+    return pa is not None
+
+def to_records(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Turn positional rows into one dict per row (the default json format)."""
+    return [dict(zip(columns, row)) for row in rows]
+
+def to_arrow_ipc(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> bytes:
+    """Encode positional rows as an Apache Arrow IPC stream."""
+    if pa is None:
+        raise RuntimeError("The arrow format requires pyarrow to be installed")
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    table = pa.Table.from_arrays([pa.array(list(col)) for col in values], names=list(columns))
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
@@ -0,0 +1,151 @@
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import json
+from contextlib import asynccontextmanager
+import sys
+from fastapi import Request
+from sqlalchemy import text
+from app.config import settings
+from app.database import get_async_engine
+
+class QueryCancelled(Exception):
+    """Raised when a running statement is cancelled because the client went away."""
+
+class QueryLimits:
+    """Resource limits for one request.
+
+    backend_pid and backend_engine are filled in while a statement runs so the
+    statement can be cancelled on the server it runs on if the client disconnects,
+    and cleared before the connection is released.
+    """
+
+    def __init__(self, statement_timeout_ms: int, max_rows: int, max_bytes: int):
+        self.statement_timeout_ms = statement_timeout_ms
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.backend_pid: Optional[int] = None
+        self.backend_engine = None
+
+def _user_caps(username: str) -> Dict[str, int]:
+    caps = {
+        "statement_timeout_ms": settings.query_statement_timeout_ms,
+        "max_rows": settings.query_max_rows,
+        "max_bytes": settings.query_max_bytes,
+    }
+    try:
+        overrides = json.loads(settings.user_query_limits or "{}").get(username, {})
+    except ValueError:
+        overrides = {}
+    caps.update({k: int(v) for k, v in overrides.items() if k in caps})
+    return caps
+
+def limits_for(username: str, statement_timeout_ms: Optional[int] = None, max_rows: Optional[int] = None,
+               max_bytes: Optional[int] = None) -> QueryLimits:
+    """Combine the per-request limits with the user's caps; a request can only tighten them."""
+    caps = _user_caps(username)
+    def effective(requested, cap):
+        if requested is None or requested <= 0:
+            return cap
+        return min(requested, cap) if cap > 0 else requested
+    return QueryLimits(
+        statement_timeout_ms=effective(statement_timeout_ms, caps["statement_timeout_ms"]),
+        max_rows=effective(max_rows, caps["max_rows"]),
+        max_bytes=effective(max_bytes, caps["max_bytes"]),
+    )
+
+async def apply_limits(connection, limits: Optional[QueryLimits]) -> None:
+    """Set the statement timeout for the current transaction and remember the backend pid.
+
+    Works with both AsyncConnection and AsyncSession.
+    """
+    if limits is None:
+        return
+    if limits.statement_timeout_ms > 0:
+        await connection.execute(text(f"SET LOCAL statement_timeout = {int(limits.statement_timeout_ms)}"))
+    if hasattr(connection, "get_raw_connection"):
+        raw = await connection.get_raw_connection()
+        limits.backend_engine = connection.engine
+    else:
+        raw = await (await connection.connection()).get_raw_connection()
+        limits.backend_engine = connection.bind
+    limits.backend_pid = raw.driver_connection.get_server_pid()
+
+def release_limits(limits: Optional[QueryLimits]) -> None:
+    """Forget the backend pid before its connection goes back to the pool, where another request may use it."""
+    if limits is not None:
+        limits.backend_pid = None
+        limits.backend_engine = None
+
+@asynccontextmanager
+async def limits_applied(connection, limits: Optional[QueryLimits]):
+    """apply_limits for the duration of the block, releasing the pid when it ends."""
+    await apply_limits(connection, limits)
+    try:
+        yield
+    finally:
+        release_limits(limits)
+
+async def collect_rows(partitions: AsyncIterator[Sequence[Any]], limits: Optional[QueryLimits],
+                       extra_rows: int = 0) -> Tuple[List[Tuple], Optional[str]]:
+    """Fetch rows until the result ends or a row/byte cap is hit; return rows and the cap that stopped them.
+
+    extra_rows are fetched past max_rows without counting as truncation, e.g. the look-ahead row of a page.
+    """
+    rows: List[Tuple] = []
+    size = 0
+    async for partition in partitions:
+        for row in partition:
+            row = tuple(row)
+            if limits and limits.max_rows > 0 and len(rows) >= limits.max_rows + extra_rows:
+                return rows, "max_rows"
+            if limits and limits.max_bytes > 0:
+                size += sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row)
+                if size > limits.max_bytes:
+                    return rows, "max_bytes"
+            rows.append(row)
+    return rows, None
+
+async def limit_partitions(partitions: AsyncIterator[Sequence[Any]], limits: Optional[QueryLimits]) -> AsyncIterator[List[Tuple]]:
+    """Yield partitions as lists of rows, ending the stream once a row/byte cap is hit."""
+    count = 0
+    size = 0
+    async for partition in partitions:
+        kept: List[Tuple] = []
+        capped = False
+        for row in partition:
+            row = tuple(row)
+            if limits and limits.max_rows > 0 and count >= limits.max_rows:
+                capped = True
+                break
+            if limits and limits.max_bytes > 0:
+                size += sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row)
+                if size > limits.max_bytes:
+                    capped = True
+                    break
+            kept.append(row)
+            count += 1
+        if kept:
+            yield kept
+        if capped:
+            return
+
+async def cancel_backend(pid: int, engine=None) -> None:
+    async with (engine or get_async_engine()).connect() as connection:
+        await connection.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": pid})
+
+async def run_cancellable(request: Request, limits: QueryLimits, work: Awaitable[Any]) -> Any:
+    """Await work, cancelling the statement on the server if the HTTP client disconnects."""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.disconnect_poll_seconds)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                if limits.backend_pid is not None:
+                    await cancel_backend(limits.backend_pid, limits.backend_engine)
+                task.cancel()
+                raise QueryCancelled("Client disconnected; query cancelled")
+    finally:
+        if not task.done():
+            task.cancel()
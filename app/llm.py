@@ -0,0 +1,342 @@
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import random
+import time
+from langchain_openai import ChatOpenAI
+from app.config import settings
+
+# Latencies kept for the hedging percentile, and how many are needed before hedging starts
+LATENCY_SAMPLES = 200
+MIN_HEDGE_SAMPLES = 20
+
+class LLMUnavailable(Exception):
+    """Raised when the LLM circuit breaker is open or a call ran out of attempts or time."""
+
+class CircuitBreaker:
+    """Open after too many failed or slow calls among the last window, then let one probe call through.
+
+    A call counts as failed when it raises or takes longer than slow_seconds. While
+    open, calls are refused for open_seconds; the first call after that is a probe
+    whose outcome closes or reopens the breaker.
+    """
+
+    def __init__(self, window: int, error_rate: float, slow_seconds: float, open_seconds: float):
+        self.window = window
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self._outcomes: Deque[bool] = deque(maxlen=max(window, 1))
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the next probe is let through, 0 when calls are allowed."""
+        if self.state != "open":
+            return 0.0
+        return max(self._opened_at + self.open_seconds - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and self.retry_after == 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record(self, ok: bool, seconds: float = 0.0) -> None:
+        failed = not ok or seconds > self.slow_seconds
+        if self.state == "half_open":
+            self._probing = False
+            if failed:
+                self._open()
+            else:
+                self.state = "closed"
+                self._outcomes.clear()
+            return
+        if self.state == "open":
+            return
+        self._outcomes.append(failed)
+        # Half a window of outcomes is enough to judge, so quiet periods still trip the breaker
+        if len(self._outcomes) >= max(self.window // 2, 1) and \
+                sum(self._outcomes) / len(self._outcomes) >= self.error_rate:
+            self._open()
+
+    def abandon(self) -> None:
+        """Forget a probe call that was cancelled before it had an outcome."""
+        self._probing = False
+
+    def _open(self) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "retry_after_seconds": round(self.retry_after, 3),
+            "recent_calls": len(self._outcomes),
+            "recent_failures": sum(self._outcomes),
+            "opened": self.opened,
+        }
+
+class LLMGateway:
+    """The one LLM client of the application, called without blocking the event loop.
+
+    Calls wait for a per-user slot and then a global slot, so a burst from one user
+    cannot take every upstream connection. Identical prompts that are in flight at
+    the same time share a single upstream call.
+
+    Every attempt has a timeout and every call a deadline. An attempt slower than the
+    hedge percentile of recent latencies gets a second, parallel attempt and the
+    first answer wins. Failed attempts are retried with capped, jittered backoff. A
+    circuit breaker refuses calls outright while the provider is failing or slow.
+    """
+
+    def __init__(self, model: Any, max_concurrency: int, user_concurrency: int,
+                 timeout_seconds: float, deadline_seconds: float, max_retries: int,
+                 retry_backoff_seconds: float, retry_backoff_max_seconds: float,
+                 hedge_percentile: float, breaker: CircuitBreaker):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.user_concurrency = user_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.retry_backoff_max_seconds = retry_backoff_max_seconds
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker
+        self._global = asyncio.Semaphore(max(max_concurrency, 1))
+        # user -> [semaphore, callers holding or waiting for it]
+        self._users: Dict[str, list] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.queued = 0
+        self.running = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.call_seconds = 0.0
+
+    @property
+    def degraded(self) -> bool:
+        """True while the circuit breaker refuses calls."""
+        return self.breaker.state == "open" and self.breaker.retry_after > 0
+
+    async def complete(self, prompt: str, user: Optional[str] = None) -> str:
+        """Return the model's reply to prompt, joining an identical call that is already running.
+
+        Raises LLMUnavailable when the breaker is open or the call failed within its deadline.
+        """
+        key = hashlib.sha1(prompt.encode()).hexdigest()
+        call = self._inflight.get(key)
+        if call is not None:
+            self.coalesced += 1
+        else:
+            call = asyncio.ensure_future(self._resilient(prompt, user))
+            self._inflight[key] = call
+            call.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A caller that goes away must not cancel the call for the others
+        return await asyncio.shield(call)
+
+    def _admit(self) -> None:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise LLMUnavailable(f"LLM circuit breaker is open; retry in {self.breaker.retry_after:.0f}s")
+
+    async def _resilient(self, prompt: str, user: Optional[str]) -> str:
+        self._admit()
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                reply = await self._hedged(prompt, user, min(self.timeout_seconds, deadline - started))
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                self.breaker.record(False)
+                backoff = min(self.retry_backoff_max_seconds, self.retry_backoff_seconds * 2 ** attempt) * random.random()
+                if attempt >= self.max_retries or time.monotonic() + backoff >= deadline or not self.breaker.allow():
+                    reason = "timed out" if isinstance(e, asyncio.TimeoutError) else f"failed: {e}"
+                    raise LLMUnavailable(f"LLM call {reason} after {attempt + 1} attempt(s)") from e
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(backoff)
+                continue
+            self.breaker.record(True, time.monotonic() - started)
+            return reply
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile <= 0 or len(self._latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(int(len(ordered) * self.hedge_percentile / 100), len(ordered) - 1)]
+
+    async def _hedged(self, prompt: str, user: Optional[str], timeout: float) -> str:
+        """One attempt within timeout, with a second attempt started once it is slower than usual."""
+        if timeout <= 0:
+            raise asyncio.TimeoutError
+        started = time.monotonic()
+        attempts = [asyncio.ensure_future(self._call(prompt, user))]
+        try:
+            hedge_delay = self._hedge_delay()
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, _ = await asyncio.wait(attempts, timeout=hedge_delay)
+                if not done:
+                    self.hedges += 1
+                    attempts.append(asyncio.ensure_future(self._call(prompt, user)))
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+            while pending:
+                remaining = timeout - (time.monotonic() - started)
+                done, pending = await asyncio.wait(pending, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError
+                for task in done:
+                    if task.exception() is None:
+                        if task is not attempts[0]:
+                            self.hedge_wins += 1
+                        self._latencies.append(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    @asynccontextmanager
+    async def _slot(self, user: Optional[str]):
+        """Hold the user's slot and a global slot, counting the wait as queued."""
+        entry = self._users.setdefault(user or "", [asyncio.Semaphore(max(self.user_concurrency, 1)), 0])
+        entry[1] += 1
+        queued_at = time.perf_counter()
+        self.queued += 1
+        waiting = True
+        try:
+            async with entry[0], self._global:
+                self.queued -= 1
+                waiting = False
+                self.running += 1
+                started = time.perf_counter()
+                self.wait_seconds += started - queued_at
+                try:
+                    yield
+                except Exception:
+                    self.errors += 1
+                    raise
+                finally:
+                    self.running -= 1
+                    self.calls += 1
+                    self.call_seconds += time.perf_counter() - started
+        finally:
+            if waiting:
+                self.queued -= 1
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._users.pop(user or "", None)
+
+    async def _call(self, prompt: str, user: Optional[str]) -> str:
+        async with self._slot(user):
+            response = await self.model.ainvoke(prompt)
+        return response.content
+
+    async def stream(self, prompt: str, user: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the model's reply to prompt piece by piece as it is generated.
+
+        Streams are never coalesced, hedged or retried, since part of the reply may
+        already be sent; each piece must arrive within the timeout and the whole
+        reply within the deadline.
+        """
+        self._admit()
+        started = time.monotonic()
+        try:
+            async with self._slot(user):
+                chunks = self.model.astream(prompt).__aiter__()
+                while True:
+                    remaining = min(self.timeout_seconds, self.deadline_seconds - (time.monotonic() - started))
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), max(remaining, 0))
+                    except StopAsyncIteration:
+                        break
+                    if chunk.content:
+                        yield chunk.content
+        except asyncio.TimeoutError as e:
+            self.timeouts += 1
+            self.breaker.record(False)
+            raise LLMUnavailable("LLM stream timed out") from e
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away
+            self.breaker.abandon()
+            raise
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True, time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        hedge_delay = self._hedge_delay()
+        return {
+            "max_concurrency": self.max_concurrency,
+            "user_concurrency": self.user_concurrency,
+            "queued": self.queued,
+            "running": self.running,
+            "in_flight_prompts": len(self._inflight),
+            "users_waiting_or_running": len(self._users),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_after_ms": round(hedge_delay * 1000, 3) if hedge_delay is not None else None,
+            "rejected": self.rejected,
+            "degraded": self.degraded,
+            "breaker": self.breaker.stats(),
+            "avg_wait_ms": round(self.wait_seconds / self.calls * 1000, 3) if self.calls else 0.0,
+            "avg_call_ms": round(self.call_seconds / self.calls * 1000, 3) if self.calls else 0.0,
+        }
+
+# Shared gateway instance
+llm_gateway = LLMGateway(
+    model=ChatOpenAI(
+        model="gpt-3.5-turbo",
+        temperature=0,
+        api_key=settings.openai_api_key,
+        # Timeouts and retries are handled by the gateway
+        max_retries=0
+    ),
+    max_concurrency=settings.llm_max_concurrency,
+    user_concurrency=settings.llm_user_concurrency,
+    timeout_seconds=settings.llm_timeout_seconds,
+    deadline_seconds=settings.llm_deadline_seconds,
+    max_retries=settings.llm_max_retries,
+    retry_backoff_seconds=settings.llm_retry_backoff_seconds,
+    retry_backoff_max_seconds=settings.llm_retry_backoff_max_seconds,
+    hedge_percentile=settings.llm_hedge_percentile,
+    breaker=CircuitBreaker(
+        window=settings.llm_breaker_window,
+        error_rate=settings.llm_breaker_error_rate,
+        slow_seconds=settings.llm_breaker_slow_seconds,
+        open_seconds=settings.llm_breaker_open_seconds
+    )
+)
@@ -1,16 +1,30 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from datetime import timedelta
 import json
-from sqlalchemy import text
+import time
+from sqlalchemy import select
 
-from app.database import get_db, engine
+from app.database import get_async_db, engine, pool_stats
 from app.models import Base, User
-from app.schemas import UserCreate, User as UserSchema, Token, SQLQuery, SQLResponse, CRUDOperation, CRUDResponse
+from app.schemas import UserCreate, User as UserSchema, Token, SQLQuery, SQLResponse, SQLBatch, SQLBatchResult, SQLBatchResponse, AnalysisResponse, CRUDOperation, CRUDResponse
 from app.auth import authenticate_user, create_access_token, get_current_active_user, get_password_hash
 from app.sql_agent_simple import sql_agent, crud_ops
+from app.cache import result_cache
+from app.governor import limits_for, run_cancellable
+from app.admission import admission
+from app.replicas import replica_router
+from app.catalog import schema_catalog
+from app.llm import llm_gateway
+from app.streaming import MEDIA_TYPES, SSE_MEDIA_TYPE, sse_event
+from app.sql_utils import is_read_only, is_enclosable, is_deterministic
+from app.batch import run_batch
+from app.bulk_copy import IMPORT_FORMATS, EXPORT_MEDIA_TYPES, copy_from_stream, copy_to_stream
+from app.encoders import RESULT_FORMATS, ARROW_MEDIA_TYPE, arrow_available, to_records, to_arrow_ipc
 from app.config import settings
 from app.agentic_nl import router as agentic_router
 
@@ -29,9 +43,17 @@ async def startup_event():
     try:
         # Create tables if they don't exist
         Base.metadata.create_all(bind=engine)
+        # Requests use the async pool; don't keep idle sync connections open
+        engine.dispose()
         print("✅ Database tables created successfully")
     except Exception as e:
         print(f"⚠️  Database initialization warning: {e}")
+    await replica_router.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background replica health checks."""
+    await replica_router.stop()
 
 # Add CORS middleware
 app.add_middleware(
@@ -46,12 +68,13 @@ app.include_router(agentic_router)
 
 # Authentication endpoints
 @app.post("/register", response_model=UserSchema)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user."""
     # Check if user already exists
-    existing_user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         (User.username == user.username) | (User.email == user.email)
-    ).first()
+    ))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -66,18 +89,18 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login to get access token."""
     print("hello",form_data.username, form_data.password)
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -97,27 +120,82 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
     return current_user
 
 # SQL Agent endpoints
+def _result_format(fmt: str) -> str:
+    fmt = fmt.lower()
+    if fmt not in RESULT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid format. Must be json, columnar, or arrow"
+        )
+    if fmt == "arrow" and not arrow_available():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The arrow format requires pyarrow to be installed"
+        )
+    return fmt
+
 @app.post("/sql/query", response_model=SQLResponse)
 async def execute_sql_query(
     query: SQLQuery,
+    request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user)
 ):
     """Execute a SQL query using the LangChain agent."""
+    analysis_mode = query.analysis.lower()
+    if analysis_mode not in ("none", "inline", "deferred"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid analysis mode. Must be none, inline, or deferred"
+        )
+    fmt = _result_format(query.format)
+    if fmt == "arrow" and analysis_mode == "inline":
+        # The Arrow body carries only rows, so there is nowhere to put an inline analysis
+        analysis_mode = "none"
     try:
         # Execute the query
-        result = sql_agent.execute_query(query.query)
+        if query.limit is not None and query.limit < 1:
+            raise ValueError("limit must be a positive integer")
+        limits = limits_for(current_user.username, query.timeout_ms, query.max_rows, query.max_bytes)
+        result = await run_cancellable(
+            request, limits,
+            sql_agent.execute_query(query.query, query.limit, query.cursor, query.order_by, limits,
+                                    current_user.username)
+        )
+        analysis_id = None
         
-        # Get LLM analysis if query was successful
-        if result["success"]:
-            analysis = sql_agent.analyze_query(query.query)
-        else:
+        # Analyze the rows we already have instead of running the query again
+        if not result["success"] or analysis_mode == "none":
             analysis = result["message"]
+        elif llm_gateway.degraded:
+            # Answer with the rows alone instead of waiting on a failing LLM
+            analysis = f"{result['message']} Analysis skipped: the LLM is unavailable."
+        elif analysis_mode == "deferred":
+            analysis_id = sql_agent.defer_analysis(current_user.id)
+            background_tasks.add_task(sql_agent.run_deferred_analysis, analysis_id, query.query, result,
+                                      current_user.username)
+            analysis = f"{result['message']} Analysis pending."
+        else:
+            analysis = await sql_agent.analyze_query(query.query, result, current_user.username)
+        
+        if fmt == "arrow" and result["success"]:
+            headers = {}
+            if analysis_id:
+                headers["X-Analysis-Id"] = analysis_id
+            if result.get("next_cursor"):
+                headers["X-Next-Cursor"] = result["next_cursor"]
+            return Response(to_arrow_ipc(result["columns"], result["rows"]), media_type=ARROW_MEDIA_TYPE, headers=headers)
         
         return SQLResponse(
-            result=result["data"],
+            result=to_records(result["columns"], result["rows"]) if fmt == "json" else [],
             query=query.query,
             message=analysis,
-            success=result["success"]
+            success=result["success"],
+            analysis_id=analysis_id,
+            columns=result["columns"] if fmt == "columnar" else None,
+            rows=result["rows"] if fmt == "columnar" else None,
+            next_cursor=result.get("next_cursor"),
+            truncated=result.get("truncated", False)
         )
     except Exception as e:
         return SQLResponse(
@@ -127,6 +205,195 @@ async def execute_sql_query(
             success=False
         )
 
+@app.post("/sql/query/events")
+async def execute_sql_query_events(
+    query: SQLQuery,
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Execute a SQL query and answer with Server-Sent Events: the result, then the analysis as it is generated."""
+    analysis_mode = query.analysis.lower()
+    if analysis_mode not in ("none", "inline"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid analysis mode. Must be none or inline"
+        )
+    fmt = _result_format(query.format)
+    if fmt == "arrow":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid format. Must be json or columnar"
+        )
+
+    async def events():
+        try:
+            if query.limit is not None and query.limit < 1:
+                raise ValueError("limit must be a positive integer")
+            limits = limits_for(current_user.username, query.timeout_ms, query.max_rows, query.max_bytes)
+            result = await run_cancellable(
+                request, limits,
+                sql_agent.execute_query(query.query, query.limit, query.cursor, query.order_by, limits,
+                                        current_user.username)
+            )
+        except Exception as e:
+            yield sse_event("error", {"message": f"Error executing query: {str(e)}"})
+            return
+        payload = {
+            "success": result["success"],
+            "message": result["message"],
+            "next_cursor": result.get("next_cursor"),
+            "truncated": result.get("truncated", False),
+        }
+        if fmt == "json":
+            payload["result"] = to_records(result["columns"], result["rows"])
+        else:
+            payload.update(columns=result["columns"], rows=result["rows"])
+        yield sse_event("result", payload)
+        if not result["success"] or analysis_mode == "none":
+            yield sse_event("done", {"analysis": None})
+            return
+        if llm_gateway.degraded:
+            yield sse_event("done", {"analysis": None, "message": "Analysis skipped: the LLM is unavailable."})
+            return
+        analysis = []
+        try:
+            async for piece in sql_agent.stream_analysis(query.query, result, current_user.username):
+                analysis.append(piece)
+                yield sse_event("analysis", {"delta": piece})
+        except Exception as e:
+            yield sse_event("error", {"message": f"Error analyzing query: {str(e)}"})
+            return
+        yield sse_event("done", {"analysis": "".join(analysis)})
+
+    return StreamingResponse(events(), media_type=SSE_MEDIA_TYPE)
+
+@app.post("/sql/batch", response_model=SQLBatchResponse)
+async def execute_sql_batch(
+    batch: SQLBatch,
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Execute several SQL statements in one request, running consecutive read-only ones concurrently."""
+    fmt = batch.format.lower()
+    if fmt not in ("json", "columnar"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid batch format. Must be json or columnar"
+        )
+    if not batch.queries or len(batch.queries) > settings.batch_max_statements:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch must contain between 1 and {settings.batch_max_statements} queries"
+        )
+    parallelism = min(batch.parallelism or settings.batch_parallelism, settings.batch_parallelism)
+
+    async def run(index: int, statement: str):
+        limits = limits_for(current_user.username, batch.timeout_ms, batch.max_rows, batch.max_bytes)
+        return await run_cancellable(request, limits, sql_agent.execute_query(statement, limits=limits, user=current_user.username))
+
+    start = time.perf_counter()
+    results = await run_batch(batch.queries, run, parallelism)
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+    return SQLBatchResponse(
+        success=all(r["success"] for r in results),
+        results=[
+            SQLBatchResult(
+                query=statement,
+                success=r["success"],
+                message=r["message"],
+                result=to_records(r["columns"], r["rows"]) if fmt == "json" else [],
+                columns=r["columns"] if fmt == "columnar" else None,
+                rows=r["rows"] if fmt == "columnar" else None,
+                truncated=r.get("truncated", False),
+                elapsed_ms=r["elapsed_ms"]
+            )
+            for statement, r in zip(batch.queries, results)
+        ],
+        elapsed_ms=elapsed_ms,
+        sum_elapsed_ms=round(sum(r["elapsed_ms"] for r in results), 3)
+    )
+
+@app.get("/sql/analysis/{analysis_id}", response_model=AnalysisResponse)
+async def get_query_analysis(
+    analysis_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Fetch the LLM analysis of a query run with deferred analysis."""
+    analysis = sql_agent.get_analysis(analysis_id, current_user.id)
+    if analysis is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis not found"
+        )
+    return analysis
+
+def _stream_format(fmt: str) -> str:
+    fmt = fmt.lower()
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid stream format. Must be ndjson or csv"
+        )
+    return fmt
+
+@app.post("/sql/query/stream")
+async def stream_sql_query(
+    query: SQLQuery,
+    format: str = "ndjson",
+    current_user: User = Depends(get_current_active_user)
+):
+    """Execute a read-only SQL query and stream the rows as NDJSON or CSV, up to the user's row and byte caps."""
+    fmt = _stream_format(format)
+    if not is_read_only(query.query):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only read-only queries can be streamed"
+        )
+    try:
+        limits = limits_for(current_user.username, query.timeout_ms, query.max_rows, query.max_bytes)
+        chunks = await sql_agent.stream_query(query.query, fmt, limits, current_user.username)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error executing query: {str(e)}"
+        )
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[fmt])
+
+@app.post("/sql/export")
+async def export_sql_query(
+    query: SQLQuery,
+    format: str = "csv",
+    gzip: bool = False,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Export the result of a read-only query with COPY TO STDOUT as CSV or PostgreSQL binary, optionally gzipped."""
+    fmt = format.lower()
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid export format. Must be csv or binary"
+        )
+    if not is_read_only(query.query) or not is_enclosable(query.query):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only read-only queries without comments or unbalanced parentheses can be exported"
+        )
+    try:
+        limits = limits_for(current_user.username, query.timeout_ms)
+        engine = replica_router.engine_for(is_deterministic(query.query), current_user.username)
+        chunks = await copy_to_stream(engine, query.query, fmt, gzip, limits)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error exporting query: {str(e)}"
+        )
+    filename = "export." + ("csv" if fmt == "csv" else "bin") + (".gz" if gzip else "")
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # CRUD Operations endpoints
 @app.post("/crud", response_model=CRUDResponse)
 async def perform_crud_operation(
@@ -134,26 +401,55 @@ async def perform_crud_operation(
     current_user: User = Depends(get_current_active_user)
 ):
     """Perform CRUD operations on the database."""
+    fmt = _result_format(operation.format)
+    if operation.records is not None and operation.operation.upper() != "CREATE":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="records is only supported for CREATE operations"
+        )
     try:
-        if operation.operation.upper() == "CREATE":
-            result = crud_ops.create_record(operation.table, operation.data)
+        if operation.operation.upper() == "CREATE" and operation.records is not None:
+            result = await crud_ops.create_records(operation.table, operation.records, operation.conflict_columns,
+                                                   current_user.username)
+            return CRUDResponse(
+                success=result["success"],
+                message=result["message"],
+                affected_rows=result.get("affected_rows"),
+                outcomes=result.get("outcomes")
+            )
+        elif operation.conflict_columns:
+            raise ValueError("conflict_columns is only supported for bulk CREATE with records")
+        elif operation.operation.upper() == "CREATE":
+            result = await crud_ops.create_record(operation.table, operation.data, current_user.username)
         elif operation.operation.upper() == "READ":
-            result = crud_ops.read_records(operation.table, operation.where_clause)
+            if operation.limit is not None and operation.limit < 1:
+                raise ValueError("limit must be a positive integer")
+            result = await crud_ops.read_records(operation.table, operation.where_clause, operation.limit,
+                                           operation.cursor, operation.order_by, current_user.username)
         elif operation.operation.upper() == "UPDATE":
-            result = crud_ops.update_records(operation.table, operation.data, operation.where_clause)
+            result = await crud_ops.update_records(operation.table, operation.data, operation.where_clause,
+                                                   current_user.username)
         elif operation.operation.upper() == "DELETE":
-            result = crud_ops.delete_records(operation.table, operation.where_clause)
+            result = await crud_ops.delete_records(operation.table, operation.where_clause, current_user.username)
         else:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid operation. Must be CREATE, READ, UPDATE, or DELETE"
             )
         
+        rows = result.get("rows")
+        if fmt == "arrow" and result["success"]:
+            headers = {"X-Next-Cursor": result["next_cursor"]} if result.get("next_cursor") else None
+            return Response(to_arrow_ipc(result["columns"], rows), media_type=ARROW_MEDIA_TYPE, headers=headers)
+        
         return CRUDResponse(
             success=result["success"],
             message=result["message"],
-            affected_rows=len(result.get("data", [])) if result.get("data") else None,
-            data=result.get("data")
+            affected_rows=len(rows) if rows else None,
+            data=to_records(result["columns"], rows) if rows is not None and fmt == "json" else None,
+            columns=result["columns"] if rows is not None and fmt == "columnar" else None,
+            rows=rows if fmt == "columnar" else None,
+            next_cursor=result.get("next_cursor")
         )
     except Exception as e:
         return CRUDResponse(
@@ -161,12 +457,71 @@ async def perform_crud_operation(
             message=f"Error performing {operation.operation} operation: {str(e)}"
         )
 
+@app.post("/crud/stream")
+async def stream_crud_read(
+    operation: CRUDOperation,
+    format: str = "ndjson",
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream the records of a READ operation as NDJSON or CSV."""
+    fmt = _stream_format(format)
+    if operation.operation.upper() != "READ":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only READ operations can be streamed"
+        )
+    try:
+        chunks = await crud_ops.stream_records(operation.table, operation.where_clause, fmt, current_user.username,
+                                               limits_for(current_user.username))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error reading records: {str(e)}"
+        )
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[fmt])
+
+@app.post("/import/{table}")
+async def import_table(
+    table: str,
+    request: Request,
+    format: str = "csv",
+    columns: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream a CSV or NDJSON request body into a table with COPY FROM STDIN.
+
+    columns is a comma-separated list; by default it comes from the CSV header or
+    the keys of the first NDJSON object.
+    """
+    fmt = format.lower()
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid import format. Must be csv or ndjson"
+        )
+    try:
+        result = await copy_from_stream(crud_ops.engine, table, request.stream(), fmt,
+                                        columns.split(",") if columns else None)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error importing records: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Import failed and was rolled back: {str(e)}"
+        )
+    result_cache.invalidate_tables([result["table"]])
+    replica_router.record_write(current_user.username)
+    return result
+
 # Database schema endpoints
 @app.get("/schema/tables")
 async def list_database_tables(current_user: User = Depends(get_current_active_user)):
     """List all tables in the database."""
     try:
-        result = sql_agent.list_tables()
+        result = await sql_agent.list_tables(current_user.username)
         return result
     except Exception as e:
         raise HTTPException(
@@ -181,7 +536,7 @@ async def get_table_schema(
 ):
     """Get the schema of a specific table."""
     try:
-        result = sql_agent.get_table_schema(table_name)
+        result = await sql_agent.get_table_schema(table_name, current_user.username)
         return result
     except Exception as e:
         raise HTTPException(
@@ -189,6 +544,36 @@ async def get_table_schema(
             detail=f"Error getting table schema: {str(e)}"
         )
 
+@app.get("/cache/stats")
+async def get_cache_stats(current_user: User = Depends(get_current_active_user)):
+    """Hit, miss and size counters of the read-result cache."""
+    return result_cache.stats()
+
+@app.get("/admission/stats")
+async def get_admission_stats(current_user: User = Depends(get_current_active_user)):
+    """Admission decisions, low-priority queue depth and plan-estimate cache counters."""
+    return admission.stats()
+
+@app.get("/llm/stats")
+async def get_llm_stats(current_user: User = Depends(get_current_active_user)):
+    """LLM gateway queue depth, in-flight calls and coalescing counters."""
+    return llm_gateway.stats()
+
+@app.get("/db/pool")
+async def get_pool_stats(current_user: User = Depends(get_current_active_user)):
+    """Live connection pool statistics (checked out, overflow, checkout wait time)."""
+    return pool_stats()
+
+@app.get("/db/catalog")
+async def get_catalog_stats(current_user: User = Depends(get_current_active_user)):
+    """Schema catalog fingerprint, size and reload counters."""
+    return schema_catalog.stats()
+
+@app.get("/db/replicas")
+async def get_replica_status(current_user: User = Depends(get_current_active_user)):
+    """Replica health, replication lag and read routing counters."""
+    return replica_router.stats()
+
 # Simple health check for Railway
 @app.get("/")
 async def root():
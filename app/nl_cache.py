@@ -0,0 +1,271 @@
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from collections import OrderedDict
+from decimal import Decimal
+import asyncio
+import json
+import re
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import settings
+from app.sql_utils import split_statements
+from app.catalog import schema_catalog
+
+# Values of low-cardinality text columns from the planner statistics, so no table is scanned
+KNOWN_VALUES_QUERY = """
+SELECT s.tablename, s.attname,
+       array_to_json(COALESCE(s.most_common_vals::text::text[], '{}') ||
+                     COALESCE(s.histogram_bounds::text::text[], '{}'))
+FROM pg_stats s
+JOIN pg_namespace n ON n.nspname = s.schemaname
+JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = s.attname
+JOIN pg_type t ON t.oid = a.atttypid
+WHERE s.schemaname = current_schema() AND t.typcategory = 'S'
+  AND CASE WHEN s.n_distinct >= 0 THEN s.n_distinct ELSE -s.n_distinct * GREATEST(c.reltuples, 0) END <= :max_distinct
+"""
+
+_INSTRUCTION_QUOTED_RE = re.compile(r"\"([^\"]*)\"|(?<!\w)'([^']*)'(?!\w)")
+_INSTRUCTION_NUMBER_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?!\w|\.\d)")
+# String literals and numbers in generated SQL; quoted identifiers are matched so they are skipped
+_SQL_LITERAL_RE = re.compile(r"'((?:[^']|'')*)'|\"(?:[^\"]|\"\")*\"|(?<![\w.$])(\d+(?:\.\d+)?)(?![\w.])")
+
+# A template is a list of statements, each a list of SQL text pieces and slot numbers
+Template = List[List[Union[str, int]]]
+
+def normalize_instruction(instruction: str) -> str:
+    """Collapse whitespace and case outside quoted strings and drop trailing punctuation."""
+    parts, last = [], 0
+    for match in _INSTRUCTION_QUOTED_RE.finditer(instruction):
+        parts.append(instruction[last:match.start()].lower())
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(instruction[last:].lower())
+    return " ".join("".join(parts).split()).rstrip(" .!?;")
+
+# Integers and decimals get different slot kinds, so "top 3" never serves "top 1.5" as LIMIT 1.5
+_NUMBER_KINDS = ("int", "decimal")
+
+def _render(kind: str, value: str) -> str:
+    if kind in _NUMBER_KINDS:
+        return value
+    return "'" + value.replace("'", "''") + "'"
+
+class TranslationCache:
+    """LRU cache with a TTL from natural language instructions to the SQL generated for them.
+
+    The exact tier matches normalized instructions. The template tier replaces
+    quoted strings, numbers and known column values in the instruction with slots,
+    so an instruction that differs only in those literals reuses the cached SQL
+    with the new literals filled in. Everything is dropped when the schema changes.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, values_refresh_seconds: float, max_column_values: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.values_refresh_seconds = values_refresh_seconds
+        self.max_column_values = max_column_values
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._known_values: Dict[str, Tuple[str, str]] = {}
+        self._known_values_re: Optional[re.Pattern] = None
+        self._fingerprint: Optional[str] = None
+        self._checked_at = float("-inf")
+        self._refresh_lock = asyncio.Lock()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.exact_hits = 0
+        self.template_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    async def refresh(self, engine: AsyncEngine) -> None:
+        """Follow the schema catalog and reload known column values every values_refresh_seconds.
+
+        A changed schema fingerprint clears every cached translation.
+        """
+        if not self.enabled:
+            return
+        catalog = await schema_catalog.snapshot(engine)
+        if catalog.fingerprint == self._fingerprint and time.monotonic() - self._checked_at < self.values_refresh_seconds:
+            return
+        async with self._refresh_lock:
+            if catalog.fingerprint == self._fingerprint and time.monotonic() - self._checked_at < self.values_refresh_seconds:
+                return
+            async with engine.connect() as connection:
+                rows = (await connection.execute(text(KNOWN_VALUES_QUERY),
+                                                 {"max_distinct": self.max_column_values})).all()
+            columns: Dict[str, Tuple[str, set]] = {}
+            for table, column, values in rows:
+                if isinstance(values, str):
+                    values = json.loads(values)
+                for value in values or []:
+                    # Only words are worth recognizing; numbers are slotted anyway
+                    if value and len(value) <= 64 and any(ch.isalpha() for ch in value):
+                        columns.setdefault(value.lower(), (value, set()))[1].add(f"{table}.{column}")
+            # A value's slot names its columns, so "in IT" and "in Electronics" never share a template
+            known = {key: (value, ",".join(sorted(names))) for key, (value, names) in columns.items()}
+            if self._fingerprint is not None and catalog.fingerprint != self._fingerprint:
+                self.invalidate()
+            with self._lock:
+                self._fingerprint = catalog.fingerprint
+                self._known_values = known
+                self._known_values_re = re.compile(
+                    r"(?<!\w)(" + "|".join(re.escape(v) for v in sorted(known, key=len, reverse=True)) + r")(?!\w)",
+                    re.IGNORECASE
+                ) if known else None
+                self._checked_at = time.monotonic()
+
+    def value_columns(self, instruction: str) -> Set[str]:
+        """table.column names of the known values mentioned in the instruction."""
+        if self._known_values_re is None:
+            return set()
+        return {column for match in self._known_values_re.finditer(instruction)
+                for column in self._known_values[match.group(1).lower()][1].split(",")}
+
+    def known_value(self, phrase: str) -> Optional[Tuple[str, Set[str]]]:
+        """The stored spelling of a known column value and the table.column names holding it."""
+        entry = self._known_values.get(phrase.lower())
+        return None if entry is None else (entry[0], set(entry[1].split(",")))
+
+    def _extract(self, instruction: str) -> Tuple[str, List[Tuple[str, str]]]:
+        """Replace the instruction's literals with slots; returns (template key, [(kind, value)])."""
+        spans = []
+        for match in _INSTRUCTION_QUOTED_RE.finditer(instruction):
+            value = match.group(1) if match.group(1) is not None else match.group(2)
+            spans.append((match.start(), match.end(), "string", value))
+
+        def free(start: int, end: int) -> bool:
+            return all(end <= s or start >= e for s, e, _, _ in spans)
+
+        if self._known_values_re is not None:
+            for match in self._known_values_re.finditer(instruction):
+                if free(match.start(), match.end()):
+                    value, column = self._known_values[match.group(1).lower()]
+                    spans.append((match.start(), match.end(), f"value:{column}", value))
+        for match in _INSTRUCTION_NUMBER_RE.finditer(instruction):
+            if free(match.start(), match.end()):
+                kind = "decimal" if "." in match.group(0) else "int"
+                spans.append((match.start(), match.end(), kind, match.group(0)))
+        spans.sort()
+        parts, last = [], 0
+        for start, end, kind, _ in spans:
+            parts.append(instruction[last:start] + "\x00" + kind + "\x00")
+            last = end
+        parts.append(instruction[last:])
+        return normalize_instruction("".join(parts)), [(kind, value) for _, _, kind, value in spans]
+
+    def _template(self, sql_query: str, literals: List[Tuple[str, str]]) -> Optional[Template]:
+        """Turn generated SQL into a template, or None when a literal cannot be placed unambiguously.
+
+        Every instruction literal has to appear in the SQL exactly once, and no SQL
+        literal may match two instruction literals: in "salary > 2 LIMIT 2" the two
+        2s cannot be told apart.
+        """
+        used = [False] * len(literals)
+        template: Template = []
+        for statement in split_statements(sql_query):
+            pieces: List[Union[str, int]] = []
+            last = 0
+            for match in _SQL_LITERAL_RE.finditer(statement):
+                if match.group(1) is not None:
+                    sql_kind, sql_value = "string", match.group(1).replace("''", "'")
+                elif match.group(2) is not None:
+                    sql_kind, sql_value = "number", match.group(2)
+                else:
+                    continue
+                slots = [i for i, (kind, value) in enumerate(literals)
+                         if (kind in _NUMBER_KINDS) == (sql_kind == "number") and
+                         (Decimal(value) == Decimal(sql_value) if kind in _NUMBER_KINDS else
+                          value.lower() == sql_value.lower() if kind.startswith("value:") else value == sql_value)]
+                if len(slots) > 1 or (slots and used[slots[0]]):
+                    return None
+                if slots:
+                    pieces.extend([statement[last:match.start()], slots[0]])
+                    used[slots[0]] = True
+                    last = match.end()
+            pieces.append(statement[last:])
+            template.append(pieces)
+        return template if all(used) else None
+
+    def get(self, instruction: str) -> Optional[Tuple[str, str]]:
+        """Return (sql, tier) for a cached translation, tier being exact or template."""
+        if not self.enabled:
+            return None
+        key, literals = self._extract(instruction)
+        with self._lock:
+            for tier, lookup in (("exact", normalize_instruction(instruction)), ("template", key)):
+                entry = self._entries.get((tier, lookup))
+                if entry is None:
+                    continue
+                if entry[0] < time.monotonic():
+                    del self._entries[(tier, lookup)]
+                    continue
+                self._entries.move_to_end((tier, lookup))
+                if tier == "exact":
+                    self.exact_hits += 1
+                    return entry[1], tier
+                self.template_hits += 1
+                statements = ["".join(piece if isinstance(piece, str) else _render(*literals[piece])
+                                      for piece in pieces) for pieces in entry[1]]
+                return "; ".join(statements), tier
+            self.misses += 1
+        return None
+
+    def put(self, instruction: str, sql_query: str, generation: Optional[int] = None) -> None:
+        """Cache a translation; it is skipped if the schema changed since generation was read."""
+        if not self.enabled:
+            return
+        key, literals = self._extract(instruction)
+        template = self._template(sql_query, literals) if literals else None
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            entries = [(("exact", normalize_instruction(instruction)), sql_query)]
+            if template is not None:
+                entries.append((("template", key), template))
+            for entry_key, value in entries:
+                self._entries[entry_key] = (expires, value)
+                self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Drop every cached translation, e.g. after a schema change."""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.exact_hits + self.template_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "templates": sum(1 for tier, _ in self._entries if tier == "template"),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "known_values": len(self._known_values),
+                "exact_hits": self.exact_hits,
+                "template_hits": self.template_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.exact_hits + self.template_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+# Shared translation cache instance
+translation_cache = TranslationCache(
+    max_entries=settings.nl_cache_max_entries,
+    ttl_seconds=settings.nl_cache_ttl_seconds,
+    values_refresh_seconds=settings.nl_cache_values_refresh_seconds,
+    max_column_values=settings.nl_cache_max_column_values
+)
@@ -0,0 +1,144 @@
+from typing import Dict, Iterable, Set, Tuple
+from functools import lru_cache
+import re
+from app.catalog import TableInfo
+
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+# Name parts too common to say anything about a column on their own
+_GENERIC_PARTS = {"id", "name", "date", "at", "type", "code", "value", "status", "is", "of"}
+
+PROMPT_TEMPLATE = """
+You are a highly reliable and safe AI SQL assistant for a PostgreSQL database.
+
+Database schema:
+{schema}
+
+Instructions:
+- Convert the following natural language instruction into valid SQL query or queries using ONLY the tables and columns listed above.
+- If the instruction contains multiple steps, output the SQL queries needed, separated by semicolons, in the correct order.
+- Never generate queries that drop tables, alter schema, or delete all records (always require a WHERE clause for DELETE).
+- Do not use columns or tables that are not listed in the schema.
+- Only output the SQL query or queries on a single line, do not include explanations, comments, or any extra text.
+- Use single quotes for string values.
+- If the instruction is not possible with the schema, output a SELECT statement that returns no rows (e.g., SELECT NULL WHERE false;).
+
+Instruction: {instruction}
+SQL:
+"""
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+@lru_cache(maxsize=4096)
+def stem(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ses", "xes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+def _stems(words: Iterable[str]) -> Set[str]:
+    return {stem(word) for word in words}
+
+def _name_score(name: str, stems: Set[str]) -> int:
+    """2 when the whole name is mentioned, 1 when a distinctive part of it is."""
+    if stem(name.lower()) in stems or stem(name.lower().replace("_", "")) in stems:
+        return 2
+    parts = [stem(part) for part in name.lower().split("_") if part and part not in _GENERIC_PARTS]
+    return 1 if any(part in stems for part in parts) else 0
+
+def score_tables(instruction: str, tables: Dict[str, TableInfo],
+                 value_columns: Set[str] = frozenset()) -> Tuple[Dict[str, float], Dict[str, Set[str]]]:
+    """Relevance of each table to the instruction and the columns it mentions.
+
+    Tables score on their name and on mentioned columns (by name, or through a
+    known value of the column); foreign-key neighbours of a scoring table get
+    half of its score so the joins it needs stay in the prompt.
+    """
+    stems = _stems(_WORD_RE.findall(instruction.lower()))
+    scores: Dict[str, float] = {}
+    matched: Dict[str, Set[str]] = {}
+    for name, table in tables.items():
+        score = 3 * _name_score(name.rpartition(".")[2], stems)
+        columns = set()
+        for column in table.columns:
+            column_score = _name_score(column.name, stems)
+            if f"{name}.{column.name}" in value_columns:
+                column_score += 2
+            if column_score:
+                columns.add(column.name)
+                score += column_score
+        scores[name] = score
+        matched[name] = columns
+    neighbours: Dict[str, float] = {}
+    for name, table in tables.items():
+        for foreign_key in table.foreign_keys:
+            if foreign_key.ref_table not in tables:
+                continue
+            for a, b in ((name, foreign_key.ref_table), (foreign_key.ref_table, name)):
+                if scores[a] > 0:
+                    neighbours[b] = max(neighbours.get(b, 0), scores[a] / 2)
+    for name, bonus in neighbours.items():
+        scores[name] += bonus
+    return scores, matched
+
+def _column_line(table: TableInfo, column) -> str:
+    notes = [column.data_type]
+    if column.name in table.primary_key:
+        notes.append("primary key")
+    for foreign_key in table.foreign_keys:
+        if column.name in foreign_key.columns:
+            ref = foreign_key.ref_columns[foreign_key.columns.index(column.name)]
+            notes.append(f"foreign key to {foreign_key.ref_table}.{ref}")
+    return f"    - {column.name} ({', '.join(notes)})"
+
+def _render(table: TableInfo, columns: Set[str]) -> str:
+    kind = "View" if table.kind == "view" else "Table"
+    lines = [f"- {kind} '{table.name}':"]
+    lines.extend(_column_line(table, column) for column in table.columns if column.name in columns)
+    return "\n".join(lines)
+
+def prune_schema(instruction: str, tables: Dict[str, TableInfo], token_budget: int,
+                 value_columns: Set[str] = frozenset()) -> str:
+    """Describe the tables and columns relevant to the instruction within token_budget.
+
+    Tables are taken in order of relevance, first with only their key and mentioned
+    columns, then the remaining columns are added while the budget lasts. When
+    nothing in the instruction matches, tables are taken by name.
+    """
+    scores, matched = score_tables(instruction, tables, value_columns)
+    ranked = sorted((name for name in tables if scores[name] > 0), key=lambda name: (-scores[name], name))
+    if not ranked:
+        ranked = sorted(tables)
+
+    selected: Dict[str, Set[str]] = {}
+    used = 0
+    for name in ranked:
+        table = tables[name]
+        keys = set(table.primary_key) | {column for fk in table.foreign_keys for column in fk.columns}
+        columns = (keys | matched[name]) or {table.columns[0].name}
+        cost = estimate_tokens(_render(table, columns))
+        if used + cost > token_budget:
+            continue
+        selected[name] = columns
+        used += cost
+    for name in selected:
+        table = tables[name]
+        for column in table.columns:
+            if column.name in selected[name]:
+                continue
+            cost = estimate_tokens(_column_line(table, column))
+            if used + cost > token_budget:
+                break
+            selected[name].add(column.name)
+            used += cost
+    return "\n".join(_render(tables[name], columns) for name, columns in selected.items())
+
+def build_prompt(instruction: str, tables: Dict[str, TableInfo], token_budget: int,
+                 value_columns: Set[str] = frozenset()) -> str:
+    """The NL-to-SQL prompt with the schema pruned to what the instruction needs."""
+    schema = prune_schema(instruction, tables, token_budget, value_columns)
+    return PROMPT_TEMPLATE.format(schema=schema or "(no tables)", instruction=instruction)
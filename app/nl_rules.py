@@ -0,0 +1,452 @@
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+from datetime import date, datetime, time as time_of_day
+from decimal import Decimal
+from uuid import UUID
+import re
+import time
+from sqlalchemy.dialects import postgresql
+from app.config import settings
+from app.catalog import ColumnInfo, TableInfo
+from app.nl_cache import translation_cache
+from app.nl_prompt import stem
+from app.statements import parse_value
+from app.llm import llm_gateway
+
+_preparer = postgresql.dialect().identifier_preparer
+
+_TOKEN_RE = re.compile(
+    r"'(?P<string>(?:[^']|'')*)'"
+    r"|\"(?P<dstring>[^\"]*)\""
+    r"|(?P<date>\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?)(?![\w:])"
+    r"|(?<![\w.])(?P<number>-?\d+(?:\.\d+)?)(?![\w.])"
+    r"|(?P<op>>=|<=|!=|<>|=|<|>)"
+    r"|(?P<comma>,)"
+    r"|(?P<word>\w+)"
+    r"|(?P<other>\S)"
+)
+
+# Column types values can be bound to, by the start of their format_type name
+_COLUMN_TYPES = (
+    (("smallint", "integer", "bigint"), int),
+    (("numeric", "decimal"), Decimal),
+    (("real", "double precision"), float),
+    (("boolean",), bool),
+    (("timestamp",), datetime),
+    (("date",), date),
+    (("time",), time_of_day),
+    (("uuid",), UUID),
+    (("character", "text", "citext"), str),
+)
+_BOOLEANS = {"true": True, "yes": True, "false": False, "no": False}
+
+_BASE_OPERATORS = {
+    "=": "=", "is": "=", "equals": "=", "equal to": "=",
+    "!=": "<>", "<>": "<>", "is not": "<>", "not": "<>", "not equal to": "<>",
+    ">": ">", "greater than": ">", "more than": ">", "higher than": ">", "above": ">", "over": ">",
+    ">=": ">=", "at least": ">=", "greater than or equal to": ">=",
+    "<": "<", "less than": "<", "lower than": "<", "below": "<", "under": "<",
+    "<=": "<=", "at most": "<=", "less than or equal to": "<=",
+    "between": "between",
+    "contains": "contains", "containing": "contains", "includes": "contains", "like": "contains",
+    "starts with": "prefix", "starting with": "prefix", "begins with": "prefix",
+    "ends with": "suffix", "ending with": "suffix",
+}
+_OPERATORS = {**_BASE_OPERATORS, **{f"is {phrase}": op for phrase, op in _BASE_OPERATORS.items()
+                                    if phrase[0].isalpha() and phrase not in ("is", "is not", "not")}}
+_SORT_DIRECTIONS = {
+    "asc": "ASC", "ascending": "ASC", "in ascending order": "ASC", "alphabetically": "ASC",
+    "lowest first": "ASC", "smallest first": "ASC", "oldest first": "ASC",
+    "desc": "DESC", "descending": "DESC", "in descending order": "DESC",
+    "highest first": "DESC", "largest first": "DESC", "newest first": "DESC",
+}
+# Longest phrases first, so "is not" is tried before "is"
+_OPERATOR_PHRASES = sorted(_OPERATORS, key=lambda phrase: -len(phrase.split()))
+_DIRECTION_PHRASES = sorted(_SORT_DIRECTIONS, key=lambda phrase: -len(phrase.split()))
+
+_SELECT_VERBS = ("show", "list", "get", "find", "display", "give", "fetch", "select", "return", "retrieve", "view")
+_INSERT_VERBS = ("add", "insert", "create", "register")
+_FILTERS = ("that have", "that has", "who have", "who has", "which have", "which has",
+            "where", "with", "whose", "having", "have", "has")
+_SORTS = ("sorted by", "ordered by", "order by", "sort by", "sorted on")
+# Words that end a value rather than being one
+_KEYWORDS = {"and", "or", "by", "sorted", "ordered", "order", "sort", "limit", "only", "with", "where", "whose",
+             "in", "for", "from", "of", "named", "called", "is", "are", "not", "have", "has", "than", "between",
+             "the", "all", "asc", "desc", "ascending", "descending"}
+
+class Token(NamedTuple):
+    kind: str  # string, number, word, op, comma
+    value: str
+
+    @property
+    def lower(self) -> str:
+        return self.value.lower()
+
+def tokenize(instruction: str) -> Optional[List[Token]]:
+    """Split an instruction into tokens, or None if it holds anything the grammar has no place for."""
+    tokens = []
+    for match in _TOKEN_RE.finditer(instruction.strip().rstrip(".!?;")):
+        kind = match.lastgroup
+        if kind == "other":
+            return None
+        value = match.group(kind)
+        if kind == "string":
+            value = value.replace("''", "'")
+        elif kind in ("dstring", "date"):
+            kind = "string"
+        tokens.append(Token(kind, value))
+    return tokens
+
+def _python_type(column: ColumnInfo) -> Optional[type]:
+    if column.data_type.endswith("]"):
+        return None
+    for prefixes, python_type in _COLUMN_TYPES:
+        if column.data_type.startswith(prefixes):
+            return python_type
+    return None
+
+def _quote_table(name: str) -> str:
+    return ".".join(_preparer.quote(part) for part in name.split("."))
+
+class _NoMatch(Exception):
+    """The instruction is outside the grammar."""
+
+class _Parser:
+    """Recursive descent over the tokens of one instruction; every method consumes or raises _NoMatch."""
+
+    def __init__(self, tokens: List[Token], tables: Mapping[str, TableInfo]):
+        self.tokens = tokens
+        # Lower-cased text of the tokens phrases can match, None for values
+        self.words = [token.lower if token.kind in ("word", "op", "comma") else None for token in tokens]
+        self.tables = tables
+        self.pos = 0
+        self.params: Dict[str, Any] = {}
+
+    def at_end(self) -> bool:
+        return self.pos == len(self.tokens)
+
+    def accept(self, *phrases: str) -> Optional[str]:
+        """Consume the first phrase the next tokens spell out and return it."""
+        first = self.words[self.pos] if self.pos < len(self.words) else None
+        if first is None:
+            return None
+        for phrase in phrases:
+            if not phrase.startswith(first) or phrase[len(first):len(first) + 1] not in ("", " "):
+                continue
+            count = phrase.count(" ") + 1
+            window = self.words[self.pos:self.pos + count]
+            if len(window) == count and None not in window and " ".join(window) == phrase:
+                self.pos += count
+                return phrase
+        return None
+
+    def expect(self, *phrases: str) -> str:
+        phrase = self.accept(*phrases)
+        if phrase is None:
+            raise _NoMatch
+        return phrase
+
+    def number(self) -> int:
+        if self.at_end() or self.tokens[self.pos].kind != "number" or not self.tokens[self.pos].value.isdigit():
+            raise _NoMatch
+        self.pos += 1
+        return int(self.tokens[self.pos - 1].value)
+
+    def _words(self, count: int) -> Optional[str]:
+        window = self.tokens[self.pos:self.pos + count]
+        if len(window) < count or any(token.kind != "word" for token in window):
+            return None
+        return "_".join(token.lower for token in window)
+
+    def table(self) -> TableInfo:
+        for count in (3, 2, 1):
+            words = self._words(count)
+            if words is None:
+                continue
+            found = [table for name, table in self.tables.items() if stem(name.rpartition(".")[2].lower()) == stem(words)]
+            if len(found) > 1:
+                raise _NoMatch
+            if found:
+                self.pos += count
+                return found[0]
+        raise _NoMatch
+
+    def column(self, table: TableInfo) -> ColumnInfo:
+        """A column by its name, singular or plural, or by its name without an _id or _name suffix."""
+        for count in (3, 2, 1):
+            words = self._words(count)
+            if words is None:
+                continue
+            exact = [column for column in table.columns if column.name.lower() == words]
+            found = exact or [column for column in table.columns
+                              if stem(column.name.lower()) == stem(words) or
+                              column.name.lower() in {f"{word}_{suffix}" for word in (words, stem(words))
+                                                      for suffix in ("id", "name")}]
+            if len(found) > 1:
+                raise _NoMatch
+            if found:
+                self.pos += count
+                return found[0]
+        raise _NoMatch
+
+    def literal(self) -> Tuple[str, Set[str]]:
+        """A value and, for a known column value, the table.column names holding it."""
+        if self.at_end():
+            raise _NoMatch
+        token = self.tokens[self.pos]
+        if token.kind in ("string", "number"):
+            self.pos += 1
+            return token.value, set()
+        if token.kind != "word" or token.lower == "null":
+            # A bare null is no value; condition() turns "is (not) null" into IS (NOT) NULL
+            raise _NoMatch
+        for count in (4, 3, 2, 1):
+            window = self.tokens[self.pos:self.pos + count]
+            if len(window) < count or any(t.kind != "word" for t in window):
+                continue
+            known = translation_cache.known_value(" ".join(t.value for t in window))
+            if known is not None:
+                self.pos += count
+                return known
+        if token.lower in _KEYWORDS:
+            raise _NoMatch
+        self.pos += 1
+        return token.value, set()
+
+    def bind(self, column: ColumnInfo, value: Any) -> str:
+        """Add value as a parameter of the column's type and return its placeholder."""
+        python_type = _python_type(column)
+        if python_type is None:
+            raise _NoMatch
+        if python_type is bool:
+            if value.lower() not in _BOOLEANS:
+                raise _NoMatch
+            value = _BOOLEANS[value.lower()]
+        else:
+            try:
+                value = parse_value(python_type, value)
+            except (ValueError, ArithmeticError):
+                raise _NoMatch
+        name = f"p{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+
+    def condition(self, table: TableInfo) -> str:
+        column = self.column(table)
+        quoted = _preparer.quote(column.name)
+        op = _OPERATORS[self.accept(*_OPERATOR_PHRASES) or "="]
+        if op in ("=", "<>") and self.accept("null"):
+            return f"{quoted} IS {'NOT ' if op == '<>' else ''}NULL"
+        if op == "between":
+            low = self.bind(column, self.literal()[0])
+            self.expect("and")
+            return f"{quoted} BETWEEN {low} AND {self.bind(column, self.literal()[0])}"
+        value = self.literal()[0]
+        if op in ("contains", "prefix", "suffix"):
+            if _python_type(column) is not str:
+                raise _NoMatch
+            escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            pattern = {"contains": f"%{escaped}%", "prefix": f"{escaped}%", "suffix": f"%{escaped}"}[op]
+            return f"{quoted} ILIKE {self.bind(column, pattern)}"
+        return f"{quoted} {op} {self.bind(column, value)}"
+
+    def known_value_condition(self, table: TableInfo) -> str:
+        """A bare value known to occur in exactly one column of the table."""
+        value, holders = self.literal()
+        columns = [column for column in table.columns if f"{table.name}.{column.name}" in holders]
+        if len(columns) != 1:
+            raise _NoMatch
+        return f"{_preparer.quote(columns[0].name)} = {self.bind(columns[0], value)}"
+
+    def name_condition(self, table: TableInfo) -> str:
+        column = table.column("name")
+        if column is None:
+            raise _NoMatch
+        return f"{_preparer.quote(column.name)} = {self.bind(column, self.literal()[0])}"
+
+    def select_columns(self) -> Tuple[TableInfo, List[ColumnInfo]]:
+        """"<column>, <column> and <column> of|from|for <table>"."""
+        for end in range(self.pos + 1, len(self.tokens)):
+            if self.tokens[end].lower not in ("of", "from", "for"):
+                continue
+            start, self.pos = self.pos, end + 1
+            try:
+                table = self.table()
+            except _NoMatch:
+                self.pos = start
+                continue
+            after, self.pos = self.pos, start
+            columns = []
+            while True:
+                self.accept("the")
+                columns.append(self.column(table))
+                if self.pos == end:
+                    break
+                self.expect(", and", ",", "and")
+            self.pos = after
+            return table, columns
+        raise _NoMatch
+
+    def select(self) -> str:
+        """SELECT or COUNT with filters, a sort order and a limit."""
+        count = self.accept("how many", "the total number of", "total number of", "the number of", "number of",
+                            "count all", "count the", "count") is not None
+        columns: List[ColumnInfo] = []
+        top = limit = None
+        if not count:
+            verb = self.accept(*_SELECT_VERBS)
+            if verb is not None:
+                self.accept("me")
+            self.accept("all of the", "all the", "all", "the", "every", "each")
+            top = self.accept("top", "first", "last", "latest")
+            if top is not None:
+                limit = self.number()
+            elif verb is None:
+                raise _NoMatch
+        start = self.pos
+        try:
+            table = self.table()
+        except _NoMatch:
+            if count:
+                raise
+            self.pos = start
+            table, columns = self.select_columns()
+        if count:
+            self.accept("are there", "there are", "do we have", "are", "exist", "exists")
+
+        conditions: List[str] = []
+        order: Optional[Tuple[ColumnInfo, Optional[str]]] = None
+        clauses = 0
+        pending = False  # a connector was read, so a bare condition may follow
+        while not self.at_end():
+            if clauses and not pending and self.accept(", and", ",", "and"):
+                pending = True
+                continue
+            if self.accept(*_SORTS) or (top in ("top", "first") and order is None and self.accept("by")):
+                if order is not None or count:
+                    raise _NoMatch
+                column = self.column(table)
+                direction = self.accept(*_DIRECTION_PHRASES)
+                order = (column, _SORT_DIRECTIONS[direction] if direction else None)
+            elif self.accept("limit", "limited to", "only"):
+                if limit is not None or count:
+                    raise _NoMatch
+                limit = self.number()
+            elif self.accept(*_FILTERS):
+                conditions.append(self.condition(table))
+            elif self.accept("in"):
+                conditions.append(self.known_value_condition(table))
+            elif self.accept("for", "from", "of"):
+                start = self.pos
+                try:
+                    conditions.append(self.known_value_condition(table))
+                except _NoMatch:
+                    self.pos = start
+                    conditions.append(self.condition(table))
+            elif self.accept("named", "called"):
+                conditions.append(self.name_condition(table))
+            elif pending:
+                conditions.append(self.condition(table))
+            else:
+                raise _NoMatch
+            clauses += 1
+            pending = False
+        if pending:
+            raise _NoMatch
+
+        sql = "SELECT " + ("COUNT(*)" if count else
+                           ", ".join(_preparer.quote(column.name) for column in columns) or "*")
+        sql += f" FROM {_quote_table(table.name)}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if order is None and top is not None and table.primary_key:
+            # first/last without a sort column follow the primary key
+            order = (table.column(table.primary_key[0]), "DESC" if top in ("last", "latest") else "ASC")
+        if order is not None:
+            direction = order[1] or ("DESC" if top in ("top", "last", "latest") else "ASC")
+            sql += f" ORDER BY {_preparer.quote(order[0].name)} {direction}"
+            if direction == "DESC":
+                sql += " NULLS LAST"
+        if limit is not None:
+            sql += f" LIMIT {limit}"
+        return sql
+
+    def insert(self) -> str:
+        """INSERT of one row from "<column> <value>" pairs."""
+        self.expect(*_INSERT_VERBS)
+        self.accept("a new", "a", "an", "new", "one")
+        table = self.table()
+        if table.kind != "table":
+            raise _NoMatch
+        self.accept("record", "row", "entry")
+        self.accept("with", "where", "having")
+        values: Dict[str, str] = {}
+        while True:
+            if self.accept("named", "called"):
+                column = table.column("name")
+                if column is None:
+                    raise _NoMatch
+            else:
+                column = self.column(table)
+                self.accept("set to", "equal to", "=", "is", "of", "as")
+            if column.name in values:
+                raise _NoMatch
+            values[column.name] = self.bind(column, self.literal()[0])
+            if self.at_end():
+                break
+            self.expect(", and", ",", "and", "with")
+        return (f"INSERT INTO {_quote_table(table.name)} ({', '.join(_preparer.quote(c) for c in values)}) "
+                f"VALUES ({', '.join(values.values())})")
+
+class RuleTranslator:
+    """Translate simple instructions to parameterized SQL locally, without the LLM.
+
+    A small grammar covers listing, filtering, sorting, limiting and counting the
+    rows of one table and inserting one row, resolving table and column names
+    through the schema catalog. An instruction is translated only if the grammar
+    accounts for every word of it; anything else is left to the LLM.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.parse_seconds = 0.0
+
+    def translate(self, instruction: str, tables: Mapping[str, TableInfo]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return (sql, params) for an instruction the grammar covers, else None."""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        translation = None
+        tokens = tokenize(instruction)
+        if tokens:
+            parser = _Parser(tokens, tables)
+            try:
+                sql = parser.insert() if tokens[0].lower in _INSERT_VERBS else parser.select()
+                if parser.at_end():
+                    translation = sql, parser.params
+            except _NoMatch:
+                pass
+        self.parse_seconds += time.perf_counter() - started
+        if translation is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return translation
+
+    def stats(self) -> Dict[str, Any]:
+        attempts = self.hits + self.misses
+        llm_call_ms = llm_gateway.stats()["avg_call_ms"]
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / attempts if attempts else 0.0,
+            "avg_parse_us": round(self.parse_seconds / attempts * 1e6, 3) if attempts else 0.0,
+            # Every hit saves one LLM call of average duration
+            "avg_llm_call_ms": llm_call_ms,
+            "estimated_saved_ms": round(self.hits * llm_call_ms, 3),
+        }
+
+# Shared rule translator instance
+rule_translator = RuleTranslator(enabled=settings.nl_rules_enabled)
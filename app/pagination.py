@@ -0,0 +1,140 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import base64
+import hashlib
+import json
+import re
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.sql_utils import is_identifier, strip_sql
+
+_primary_keys: Dict[str, List[str]] = {}
+
+# Clauses that would fight with the ORDER BY and LIMIT a page adds
+_ORDERING_RE = re.compile(r"\b(?:order\s+by|limit|offset|fetch)\b")
+
+# asyncpg binds parameters with the server-inferred type, so cursor values keep their Python type
+_CURSOR_TYPES = {
+    "datetime": (datetime, datetime.fromisoformat),
+    "date": (date, date.fromisoformat),
+    "time": (time, time.fromisoformat),
+    "decimal": (Decimal, Decimal),
+    "uuid": (UUID, UUID),
+}
+
+async def primary_key_columns(engine: AsyncEngine, table: str) -> List[str]:
+    """Return the primary key columns of a table, cached per table name."""
+    if table not in _primary_keys:
+        async with engine.connect() as connection:
+            constraint = await connection.run_sync(lambda sync_conn: inspect(sync_conn).get_pk_constraint(table))
+        _primary_keys[table] = constraint.get("constrained_columns") or []
+    return _primary_keys[table]
+
+def forget_primary_keys() -> None:
+    """Drop the cached primary keys, e.g. after a schema change."""
+    _primary_keys.clear()
+
+def _dump_value(value: Any) -> Any:
+    for tag, (kind, _) in _CURSOR_TYPES.items():
+        if isinstance(value, kind):
+            return {"$" + tag: value.isoformat() if hasattr(value, "isoformat") else str(value)}
+    return value
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict) and len(value) == 1:
+        tag, raw = next(iter(value.items()))
+        if tag[1:] in _CURSOR_TYPES:
+            return _CURSOR_TYPES[tag[1:]][1](raw)
+    return value
+
+def query_fingerprint(*parts: Any) -> str:
+    """Fingerprint the query a cursor was issued for so it cannot be replayed against another."""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def encode_cursor(fingerprint: str, keys: Sequence[str], values: Sequence[Any]) -> str:
+    payload = json.dumps({"q": fingerprint, "k": list(keys), "v": [_dump_value(v) for v in values]}, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, fingerprint: str, keys: Sequence[str]) -> List[Any]:
+    """Return the last-seen key values stored in a cursor issued for the same query."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("q") != fingerprint or payload.get("k") != list(keys):
+        raise ValueError("Cursor does not belong to this query")
+    return [_load_value(v) for v in payload["v"]]
+
+def keyset_condition(keys: Sequence[str], values: Optional[Sequence[Any]]) -> Tuple[str, Dict[str, Any]]:
+    """Build the row-value comparison that seeks past the last page, with bound parameters."""
+    if values is None:
+        return "", {}
+    placeholders = ", ".join(f":_cursor_{i}" for i in range(len(keys)))
+    params = {f"_cursor_{i}": value for i, value in enumerate(values)}
+    return f"({', '.join(keys)}) > ({placeholders})", params
+
+def _top_level(stripped: str) -> str:
+    """The parts of a stripped statement outside parentheses and quoted identifiers."""
+    parts, depth, quoted = [], 0, False
+    for char in stripped:
+        if char == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            parts.append(char)
+    return "".join(parts)
+
+def page_query(query: str, keys: Sequence[str], values: Optional[Sequence[Any]], limit: int) -> Tuple[str, Dict[str, Any]]:
+    """Wrap a SELECT so it returns one page after the cursor position, plus one look-ahead row.
+
+    PostgreSQL flattens the simple subquery, so the seek predicate and ORDER BY/LIMIT
+    reach the underlying index and every page costs about the same as the first.
+    """
+    if _ORDERING_RE.search(_top_level(strip_sql(query))):
+        raise ValueError("Paged queries cannot have their own ORDER BY, LIMIT or OFFSET; use order_by and limit")
+    condition, params = keyset_condition(keys, values)
+    paged = f"SELECT * FROM ({query.strip().rstrip(';')}) AS _page"
+    if condition:
+        paged += f" WHERE {condition}"
+    paged += f" ORDER BY {', '.join(keys)} LIMIT {int(limit) + 1}"
+    return paged, params
+
+def paginate(keys: Sequence[str], columns: Sequence[str], rows: List[Tuple], limit: int, fingerprint: str,
+             more: bool = False) -> Tuple[List[Tuple], Optional[str]]:
+    """Trim the extra look-ahead row and build the cursor for the next page if there is one.
+
+    more marks a page cut short by a cap, so the next page continues after its last row.
+    """
+    missing = [key for key in keys if key not in columns]
+    if missing:
+        raise ValueError(f"Sort key {missing[0]!r} is not in the result columns")
+    positions = [list(columns).index(key) for key in keys]
+    if len(rows) > limit:
+        # Rows tied with the last one on every key would be skipped by the next page
+        if [rows[limit][i] for i in positions] == [rows[limit - 1][i] for i in positions]:
+            raise ValueError("order_by does not identify rows uniquely; add a unique column to it")
+        rows = rows[:limit]
+    elif not (more and rows):
+        return rows, None
+    last = rows[-1]
+    return rows, encode_cursor(fingerprint, keys, [last[i] for i in positions])
+
+def sort_keys(order_by: Optional[Sequence[str]], primary_key: Sequence[str]) -> List[str]:
+    """Use the requested sort key (falling back to the primary key) plus the primary key as tie-breaker."""
+    keys = list(order_by or [])
+    for column in primary_key:
+        if column not in keys:
+            keys.append(column)
+    if not keys:
+        raise ValueError("Pagination needs a primary key or an order_by column")
+    if not all(is_identifier(key) for key in keys):
+        raise ValueError("order_by must contain plain column names")
+    return keys
@@ -0,0 +1,134 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import itertools
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import settings
+from app.database import get_async_engine
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything it received
+LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+class ReplicaRouter:
+    """Send read-only statements to healthy replicas and everything else to the primary.
+
+    A user's reads stay on the primary for a short window after their own write so
+    they always see it. Replicas are checked periodically and leave the rotation
+    while they are unreachable or lag more than the configured maximum.
+    """
+
+    def __init__(self, replica_urls: List[str], max_lag_seconds: float, sticky_seconds: float, check_interval: float):
+        self.replica_urls = replica_urls
+        self.max_lag_seconds = max_lag_seconds
+        self.sticky_seconds = sticky_seconds
+        self.check_interval = check_interval
+        self._state: Dict[str, Dict[str, Any]] = {
+            url: {"healthy": False, "lag_seconds": None, "error": None, "checked_at": None, "reads": 0}
+            for url in replica_urls
+        }
+        self._last_write: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    def primary(self) -> AsyncEngine:
+        return get_async_engine()
+
+    def is_sticky(self, user: Optional[str]) -> bool:
+        """True while the user's reads are pinned to the primary after their own write."""
+        if user is None or not self.replica_urls:
+            return False
+        with self._lock:
+            return time.monotonic() - self._last_write.get(user, float("-inf")) < self.sticky_seconds
+
+    def read_engine(self, user: Optional[str] = None) -> AsyncEngine:
+        """Engine for a read-only statement: a healthy replica unless the user wrote recently."""
+        with self._lock:
+            healthy = [url for url in self.replica_urls if self._state[url]["healthy"]]
+            if user is not None and time.monotonic() - self._last_write.get(user, float("-inf")) < self.sticky_seconds:
+                self.sticky_reads += 1
+                return self.primary()
+            if not healthy:
+                self.primary_reads += 1
+                return self.primary()
+            url = healthy[next(self._turn) % len(healthy)]
+            self._state[url]["reads"] += 1
+        return get_async_engine(url)
+
+    def engine_for(self, read_only: bool, user: Optional[str] = None) -> AsyncEngine:
+        return self.read_engine(user) if read_only else self.primary()
+
+    def record_write(self, user: Optional[str]) -> None:
+        """Pin the user's reads to the primary for the sticky window."""
+        if user is None or not self.replica_urls:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._last_write[user] = now
+            # Forget users whose window has passed so the map stays small
+            if len(self._last_write) > 10000:
+                self._last_write = {u: t for u, t in self._last_write.items() if now - t < self.sticky_seconds}
+
+    async def check_replicas(self) -> None:
+        """Measure every replica's replay lag and update the rotation."""
+        for url in self.replica_urls:
+            try:
+                async with get_async_engine(url).connect() as connection:
+                    # SET LOCAL ends with the check's transaction, so pooled connections keep their own timeout
+                    await connection.execute(text(f"SET LOCAL statement_timeout = {int(self.check_interval * 1000)}"))
+                    lag = float((await connection.execute(text(LAG_QUERY))).scalar())
+                healthy = lag <= self.max_lag_seconds
+                update = {"healthy": healthy, "lag_seconds": round(lag, 3),
+                          "error": None if healthy else f"lag {lag:.1f}s exceeds {self.max_lag_seconds}s"}
+            except Exception as e:
+                update = {"healthy": False, "lag_seconds": None, "error": str(e)}
+            with self._lock:
+                self._state[url].update(update, checked_at=time.time())
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check_replicas()
+
+    async def start(self) -> None:
+        """Run a first health check and keep checking in the background."""
+        if self.replica_urls and self._task is None:
+            await self.check_replicas()
+            self._task = asyncio.ensure_future(self._monitor())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "replicas": [
+                    {"url": make_url(url).render_as_string(hide_password=True), **state}
+                    for url, state in self._state.items()
+                ],
+                "max_lag_seconds": self.max_lag_seconds,
+                "sticky_seconds": self.sticky_seconds,
+                "primary_reads": self.primary_reads,
+                "sticky_reads": self.sticky_reads,
+            }
+
+# Shared router instance
+replica_router = ReplicaRouter(
+    replica_urls=[url.strip() for url in settings.database_replica_urls.split(",") if url.strip()],
+    max_lag_seconds=settings.replica_max_lag_seconds,
+    sticky_seconds=settings.replica_sticky_seconds,
+    check_interval=settings.replica_check_interval
+)
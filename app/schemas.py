@@ -31,21 +31,73 @@ class TokenData(BaseModel):
 class SQLQuery(BaseModel):
     query: str
     description: Optional[str] = None
+    analysis: str = "inline"  # none, inline, deferred
+    format: str = "json"  # json, columnar, arrow
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    order_by: Optional[List[str]] = None
+    timeout_ms: Optional[int] = None
+    max_rows: Optional[int] = None
+    max_bytes: Optional[int] = None
 
 class SQLResponse(BaseModel):
-    result: List[Dict[str, Any]]
+    result: List[Dict[str, Any]] = []
     query: str
     message: str
     success: bool
+    analysis_id: Optional[str] = None
+    columns: Optional[List[str]] = None
+    rows: Optional[List[List[Any]]] = None
+    next_cursor: Optional[str] = None
+    truncated: bool = False
+
+class SQLBatch(BaseModel):
+    queries: List[str]
+    format: str = "json"  # json, columnar
+    parallelism: Optional[int] = None
+    timeout_ms: Optional[int] = None
+    max_rows: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+class SQLBatchResult(BaseModel):
+    query: str
+    success: bool
+    message: str
+    result: List[Dict[str, Any]] = []
+    columns: Optional[List[str]] = None
+    rows: Optional[List[List[Any]]] = None
+    truncated: bool = False
+    elapsed_ms: float
+
+class SQLBatchResponse(BaseModel):
+    success: bool
+    results: List[SQLBatchResult]
+    elapsed_ms: float
+    sum_elapsed_ms: float  # what running the statements one after another would have taken
+
+class AnalysisResponse(BaseModel):
+    analysis_id: str
+    status: str  # pending, completed
+    message: Optional[str] = None
 
 class CRUDOperation(BaseModel):
     operation: str  # CREATE, READ, UPDATE, DELETE
     table: str
-    data: Dict[str, Any]
+    data: Dict[str, Any] = {}
+    records: Optional[List[Dict[str, Any]]] = None  # bulk CREATE
+    conflict_columns: Optional[List[str]] = None  # upsert key for bulk CREATE
     where_clause: Optional[Dict[str, Any]] = None
+    format: str = "json"  # json, columnar, arrow
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    order_by: Optional[List[str]] = None
 
 class CRUDResponse(BaseModel):
     success: bool
     message: str
     affected_rows: Optional[int] = None
-    data: Optional[List[Dict[str, Any]]] = None 
\ No newline at end of file
+    data: Optional[List[Dict[str, Any]]] = None
+    columns: Optional[List[str]] = None
+    rows: Optional[List[List[Any]]] = None 
+    next_cursor: Optional[str] = None
+    outcomes: Optional[List[Dict[str, Any]]] = None  # per-record status of a bulk CREATE
\ No newline at end of file
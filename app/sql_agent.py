@@ -1,25 +1,18 @@
 from typing import Dict, List, Any, Optional
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolExecutor
 from langchain_core.tools import tool
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 import json
 from app.config import settings
-
-# Initialize LLM
-llm = ChatOpenAI(
-    model="gpt-3.5-turbo",
-    temperature=0,
-    api_key=settings.openai_api_key
-)
+from app.database import get_engine
+from app.llm import llm_gateway
 
 # Database engine
-db_engine = create_engine(settings.database_url)
+db_engine = get_engine()
 
 # Define the state
 class AgentState:
@@ -124,8 +117,8 @@ def create_sql_agent():
         state.result = {"tool_result": result}
         return state
 
-    def respond(state: AgentState) -> AgentState:
-        """Generate a response based on the tool result."""
+    async def respond(state: AgentState) -> AgentState:
+        """Generate a response based on the tool result (run the graph with ainvoke)."""
         tool_result = state.result.get("tool_result", "")
         
         prompt = ChatPromptTemplate.from_messages([
@@ -133,8 +126,7 @@ def create_sql_agent():
             ("human", "Query result: {result}\n\nProvide a clear explanation of this result.")
         ])
         
-        chain = prompt | llm | StrOutputParser()
-        response = chain.invoke({"result": tool_result})
+        response = await llm_gateway.complete(prompt.format(result=tool_result))
         
         state.messages.append(AIMessage(content=response))
         return state
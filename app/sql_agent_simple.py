@@ -1,73 +1,189 @@
-from typing import Dict, List, Any, Optional
-from langchain_openai import ChatOpenAI
-from sqlalchemy import create_engine, text
+from typing import AsyncIterator, Dict, List, Any, Optional
+from sqlalchemy import Table, text
 from sqlalchemy.exc import SQLAlchemyError
+from collections import OrderedDict
 import json
+import threading
+import uuid
 from app.config import settings
-
-# Initialize LLM
-llm = ChatOpenAI(
-    model="gpt-3.5-turbo",
-    temperature=0,
-    api_key=settings.openai_api_key
-)
+from app.database import get_async_engine
+from app.streaming import open_stream, encode_stream
+from app.pagination import primary_key_columns, query_fingerprint, decode_cursor, page_query, paginate, sort_keys
+from app.sql_utils import is_ddl, is_deterministic, is_read_only, referenced_tables
+from app.cache import result_cache, make_cache_key
+from app.governor import QueryLimits, collect_rows, limits_applied
+from app.admission import admission, QueryRejected
+from app.replicas import replica_router
+from app.catalog import schema_catalog
+from app.llm import LLMUnavailable, llm_gateway
+from app.summarize import summarize_result
+from app.statements import reflect_table, insert_statement, bulk_insert_statement, update_statement, delete_statement, select_sql, typed_text, bind_values
 
 # Database engine
-db_engine = create_engine(settings.database_url)
+db_engine = get_async_engine()
+
+async def _as_partitions(result):
+    """Adapt a buffered result to the partition iterator collect_rows expects."""
+    yield result.fetchall()
 
 class SimpleSQLAgent:
     def __init__(self):
         self.engine = db_engine
-        self.llm = llm
+        self._analyses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._analyses_lock = threading.Lock()
+
+    async def execute_query(self, query: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                            order_by: Optional[List[str]] = None, limits: Optional[QueryLimits] = None,
+                            user: Optional[str] = None) -> Dict[str, Any]:
+        """Execute a SQL query and return its column names and rows as tuples.
+
+        With limit or cursor a read-only query is paged by keyset on order_by, defaulting
+        to the primary key when the query reads a single table. Read-only results are
+        served from the result cache; writes invalidate the tables they touch. limits
+        sets the statement timeout and the row/byte caps at which fetching stops.
+        Reads go to a replica unless user wrote recently, in which case they also
+        bypass the result cache.
+        """
+        tables = referenced_tables(query)
+        if not is_read_only(query):
+            result = await self._run_query(query, limit, cursor, order_by, limits, user)
+            if result["success"]:
+                result_cache.invalidate_tables(tables)
+                replica_router.record_write(user)
+                if is_ddl(query):
+                    schema_catalog.expire()
+            return result
+        if not is_deterministic(query):
+            # nextval(), now(), random() and the like must run every time
+            return await self._run_query(query, limit, cursor, order_by, limits, user)
+        caps = (limits.max_rows, limits.max_bytes) if limits else None
+        key = make_cache_key(query, limit, cursor, order_by, caps)
+        return await result_cache.get_or_load(key, tables, lambda: self._run_query(query, limit, cursor, order_by, limits, user),
+                                              refresh=replica_router.is_sticky(user))
 
-    def execute_query(self, query: str) -> Dict[str, Any]:
-        """Execute a SQL query and return results."""
+    async def _run_query(self, query: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                         order_by: Optional[List[str]] = None, limits: Optional[QueryLimits] = None,
+                         user: Optional[str] = None) -> Dict[str, Any]:
         try:
-            with self.engine.connect() as connection:
-                result = connection.execute(text(query))
-                if result.returns_rows:
-                    rows = [dict(row._mapping) for row in result]
-                    return {
-                        "success": True,
-                        "data": rows,
-                        "message": f"Query executed successfully. Retrieved {len(rows)} rows."
-                    }
+            statement, params, keys = query, {}, None
+            read_only = is_read_only(query)
+            engine = replica_router.engine_for(read_only and is_deterministic(query), user)
+            if limit is not None or cursor:
+                if not read_only:
+                    raise ValueError("Pagination is only supported for read-only queries")
+                limit = limit or settings.default_page_size
+                if limits and limits.max_rows > 0:
+                    # The look-ahead row is fetched on top of the cap; see collect_rows
+                    limit = min(limit, limits.max_rows)
+                tables = referenced_tables(query)
+                # The primary key breaks ties in order_by, so no row is skipped between pages
+                primary_key = await primary_key_columns(self.engine, tables[0]) if len(tables) == 1 else []
+                keys = sort_keys(order_by, primary_key)
+                fingerprint = query_fingerprint(query, keys)
+                values = decode_cursor(cursor, fingerprint, keys) if cursor else None
+                statement, params = page_query(query, keys, values, limit)
+            decision = await admission.check(engine, statement, params)
+            async with admission.slot(decision), engine.connect() as connection, limits_applied(connection, limits):
+                if read_only:
+                    # Fetch on a server-side cursor so the row and byte caps stop reading early
+                    result = await connection.stream(
+                        text(statement), params, execution_options={"yield_per": settings.stream_chunk_size}
+                    )
+                    columns = list(result.keys())
+                    rows, truncated = await collect_rows(result.partitions(), limits, 1 if keys else 0)
+                    await result.close()
                 else:
-                    return {
-                        "success": True,
-                        "data": [],
-                        "message": f"Query executed successfully. {result.rowcount} rows affected."
-                    }
+                    result = await connection.execute(text(statement), params)
+                    if not result.returns_rows:
+                        return {
+                            "success": True,
+                            "columns": [],
+                            "rows": [],
+                            "message": f"Query executed successfully. {result.rowcount} rows affected."
+                        }
+                    columns = list(result.keys())
+                    rows, truncated = await collect_rows(_as_partitions(result), limits)
+                next_cursor = None
+                if keys:
+                    rows, next_cursor = paginate(keys, columns, rows, limit, fingerprint, more=truncated is not None)
+                message = f"Query executed successfully. Retrieved {len(rows)} rows."
+                if truncated and next_cursor:
+                    message += f" Page cut short by the {truncated} limit; continue with next_cursor."
+                elif truncated:
+                    message += f" Result truncated by the {truncated} limit."
+                return {
+                    "success": True,
+                    "columns": columns,
+                    "rows": rows,
+                    "next_cursor": next_cursor,
+                    "truncated": truncated is not None,
+                    "message": message
+                }
+        except QueryRejected as e:
+            return {
+                "success": False,
+                "columns": [],
+                "rows": [],
+                "message": str(e)
+            }
         except SQLAlchemyError as e:
             return {
                 "success": False,
-                "data": [],
+                "columns": [],
+                "rows": [],
                 "message": f"Database error: {str(e)}"
             }
         except Exception as e:
             return {
                 "success": False,
-                "data": [],
+                "columns": [],
+                "rows": [],
                 "message": f"Error: {str(e)}"
             }
 
-    def get_table_schema(self, table_name: str) -> Dict[str, Any]:
-        """Get the schema of a specific table."""
+    async def stream_query(self, query: str, fmt: str = "ndjson", limits: Optional[QueryLimits] = None,
+                           user: Optional[str] = None):
+        """Execute a read-only query on a server-side cursor and return an async iterator of encoded chunks."""
+        if not is_read_only(query):
+            raise ValueError("Only read-only queries can be streamed")
+        connection, result = await open_stream(replica_router.engine_for(is_deterministic(query), user), query, limits=limits)
+        return encode_stream(connection, result, fmt, limits)
+
+    async def get_table_schema(self, table_name: str, user: Optional[str] = None) -> Dict[str, Any]:
+        """Get the schema of a specific table from the cached catalog."""
         try:
-            with self.engine.connect() as connection:
-                query = f"""
-                SELECT column_name, data_type, is_nullable, column_default
-                FROM information_schema.columns
-                WHERE table_name = '{table_name}' AND table_schema = 'public'
-                ORDER BY ordinal_position;
-                """
-                result = connection.execute(text(query))
-                schema = [dict(row._mapping) for row in result]
+            catalog = await schema_catalog.snapshot(replica_router.read_engine(user))
+            table = catalog.table(table_name)
+            if table is None:
                 return {
-                    "success": True,
-                    "data": schema,
-                    "message": f"Schema retrieved for table '{table_name}'"
+                    "success": False,
+                    "data": [],
+                    "message": f"Table {table_name!r} does not exist"
                 }
+            return {
+                "success": True,
+                "data": [
+                    {
+                        "column_name": column.name,
+                        "data_type": column.data_type,
+                        "is_nullable": "YES" if column.nullable else "NO",
+                        "column_default": column.default
+                    }
+                    for column in table.columns
+                ],
+                "table": table.name,
+                "kind": table.kind,
+                "primary_key": list(table.primary_key),
+                "foreign_keys": [
+                    {"columns": list(fk.columns), "references": fk.ref_table, "ref_columns": list(fk.ref_columns)}
+                    for fk in table.foreign_keys
+                ],
+                "indexes": [
+                    {"name": index.name, "columns": list(index.columns), "unique": index.unique, "definition": index.definition}
+                    for index in table.indexes
+                ],
+                "message": f"Schema retrieved for table '{table.name}'"
+            }
         except Exception as e:
             return {
                 "success": False,
@@ -75,23 +191,17 @@ class SimpleSQLAgent:
                 "message": f"Error getting schema: {str(e)}"
             }
 
-    def list_tables(self) -> Dict[str, Any]:
-        """List all tables in the database."""
+    async def list_tables(self, user: Optional[str] = None) -> Dict[str, Any]:
+        """List the tables and views of the public schema from the cached catalog."""
         try:
-            with self.engine.connect() as connection:
-                query = """
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public'
-                ORDER BY table_name;
-                """
-                result = connection.execute(text(query))
-                tables = [row[0] for row in result]
-                return {
-                    "success": True,
-                    "data": tables,
-                    "message": f"Found {len(tables)} tables"
-                }
+            catalog = await schema_catalog.snapshot(replica_router.read_engine(user))
+            # The catalog covers every schema; this endpoint has always listed only public
+            tables = [name for name, table in catalog.tables.items() if table.schema == "public"]
+            return {
+                "success": True,
+                "data": tables,
+                "message": f"Found {len(tables)} tables"
+            }
         except Exception as e:
             return {
                 "success": False,
@@ -99,32 +209,64 @@ class SimpleSQLAgent:
                 "message": f"Error listing tables: {str(e)}"
             }
 
-    def analyze_query(self, query: str) -> str:
-        """Use LLM to analyze and explain the query result."""
-        try:
-            # First execute the query
-            result = self.execute_query(query)
-            
-            if not result["success"]:
-                return f"Query failed: {result['message']}"
-            
-            # Create a prompt for the LLM to analyze the results
-            prompt = f"""
+    def analysis_prompt(self, query: str, result: Dict[str, Any]) -> str:
+        """The prompt asking the LLM to explain a query and its results."""
+        summary = summarize_result(result['columns'], result['rows'], settings.analysis_token_budget,
+                                   settings.analysis_sample_rows, settings.analysis_top_k)
+        return f"""
             Analyze this SQL query and its results:
             
             Query: {query}
-            Results: {json.dumps(result['data'], indent=2)}
+            Results (column statistics over all rows and a sample of the rows): {json.dumps(summary, default=str)}
             
             Provide a clear explanation of what this query does and what the results mean.
             """
+
+    async def analyze_query(self, query: str, result: Dict[str, Any], user: Optional[str] = None) -> str:
+        """Use LLM to analyze and explain an already computed query result."""
+        try:
+            if not result["success"]:
+                return f"Query failed: {result['message']}"
             
             # Get LLM response
-            response = self.llm.invoke(prompt)
-            return response.content
+            return await llm_gateway.complete(self.analysis_prompt(query, result), user)
             
+        except LLMUnavailable as e:
+            return f"{result['message']} Analysis unavailable: {str(e)}"
         except Exception as e:
             return f"Error analyzing query: {str(e)}"
 
+    def stream_analysis(self, query: str, result: Dict[str, Any], user: Optional[str] = None) -> AsyncIterator[str]:
+        """Iterate over the analysis of an already computed query result as the LLM generates it."""
+        return llm_gateway.stream(self.analysis_prompt(query, result), user)
+
+    def defer_analysis(self, user_id: int) -> str:
+        """Register a pending analysis for a user and return its id."""
+        analysis_id = uuid.uuid4().hex
+        with self._analyses_lock:
+            self._analyses[analysis_id] = {"user_id": user_id, "status": "pending", "message": None}
+            while len(self._analyses) > settings.analysis_store_size:
+                self._analyses.popitem(last=False)
+        return analysis_id
+
+    async def run_deferred_analysis(self, analysis_id: str, query: str, result: Dict[str, Any],
+                                    user: Optional[str] = None) -> None:
+        """Compute a deferred analysis and store it under its id."""
+        message = await self.analyze_query(query, result, user)
+        with self._analyses_lock:
+            entry = self._analyses.get(analysis_id)
+            if entry is not None:
+                entry["status"] = "completed"
+                entry["message"] = message
+
+    def get_analysis(self, analysis_id: str, user_id: int) -> Optional[Dict[str, Any]]:
+        """Return a deferred analysis if it belongs to the given user."""
+        with self._analyses_lock:
+            entry = self._analyses.get(analysis_id)
+            if entry is None or entry["user_id"] != user_id:
+                return None
+            return {"analysis_id": analysis_id, "status": entry["status"], "message": entry["message"]}
+
 # Create agent instance
 sql_agent = SimpleSQLAgent()
 
@@ -133,72 +275,156 @@ class CRUDOperations:
     def __init__(self):
         self.engine = db_engine
 
-    def create_record(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_record(self, table: str, data: Dict[str, Any], user: Optional[str] = None) -> Dict[str, Any]:
         """Create a new record in the specified table."""
         try:
-            columns = ", ".join(data.keys())
-            values = ", ".join([f"'{v}'" if isinstance(v, str) else str(v) for v in data.values()])
-            query = f"INSERT INTO {table} ({columns}) VALUES ({values}) RETURNING *"
-            
-            with self.engine.connect() as connection:
-                result = connection.execute(text(query))
-                connection.commit()
-                return {"success": True, "message": "Record created successfully", "data": [dict(result.fetchone()._mapping)]}
-        except SQLAlchemyError as e:
+            reflected = await reflect_table(self.engine, table)
+            statement = insert_statement(reflected, list(data))
+            async with self.engine.connect() as connection:
+                result = await connection.execute(statement, bind_values(reflected, "v", data))
+                await connection.commit()
+                result_cache.invalidate_tables([reflected.name])
+                replica_router.record_write(user)
+                return {"success": True, "message": "Record created successfully", "columns": list(result.keys()), "rows": [tuple(result.fetchone())]}
+        except (SQLAlchemyError, ValueError) as e:
             return {"success": False, "message": f"Error creating record: {str(e)}"}
 
-    def read_records(self, table: str, where_clause: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Read records from the specified table."""
+    async def create_records(self, table: str, records: List[Dict[str, Any]], conflict_columns: Optional[List[str]] = None,
+                             user: Optional[str] = None) -> Dict[str, Any]:
+        """Insert (or upsert on conflict_columns) many records in one transaction with per-row outcomes.
+
+        Records are grouped by column set and sent as batched executemany. A batch that
+        fails is replayed row by row under savepoints so only the bad rows are rejected.
+        """
+        try:
+            if len(records) > settings.crud_bulk_max_records:
+                raise ValueError(f"At most {settings.crud_bulk_max_records} records can be sent at once")
+            reflected = await reflect_table(self.engine, table)
+            conflict = list(conflict_columns or [])
+            outcomes: List[Dict[str, Any]] = [{"index": i, "status": None, "error": None} for i in range(len(records))]
+            shapes: "OrderedDict[tuple, List[tuple]]" = OrderedDict()
+            for i, record in enumerate(records):
+                try:
+                    shapes.setdefault(tuple(record), []).append((i, bind_values(reflected, "v", record)))
+                except ValueError as e:
+                    outcomes[i].update(status="error", error=str(e))
+            async with self.engine.connect() as connection:
+                for columns, rows in shapes.items():
+                    statement = bulk_insert_statement(reflected, columns, conflict)
+                    for start in range(0, len(rows), settings.crud_bulk_batch_size):
+                        batch = rows[start:start + settings.crud_bulk_batch_size]
+                        try:
+                            async with connection.begin_nested():
+                                result = await connection.execute(statement, [params for _, params in batch])
+                                inserted = [row._mapping["_inserted"] for row in result]
+                        except SQLAlchemyError:
+                            inserted = []
+                            for i, params in batch:
+                                try:
+                                    async with connection.begin_nested():
+                                        result = await connection.execute(statement, params)
+                                        inserted.append(result.one()._mapping["_inserted"])
+                                except SQLAlchemyError as e:
+                                    inserted.append(None)
+                                    outcomes[i].update(status="error", error=str(e.orig if getattr(e, "orig", None) else e))
+                        for (i, _), was_inserted in zip(batch, inserted):
+                            if was_inserted is not None:
+                                outcomes[i]["status"] = "inserted" if was_inserted else "updated"
+                await connection.commit()
+            result_cache.invalidate_tables([reflected.name])
+            replica_router.record_write(user)
+            counts = {status: sum(1 for o in outcomes if o["status"] == status) for status in ("inserted", "updated", "error")}
+            return {
+                "success": counts["error"] == 0,
+                "message": f"Inserted {counts['inserted']}, updated {counts['updated']}, failed {counts['error']} of {len(records)} records",
+                "affected_rows": counts["inserted"] + counts["updated"],
+                "outcomes": outcomes
+            }
+        except (SQLAlchemyError, ValueError) as e:
+            return {"success": False, "message": f"Error creating records: {str(e)}"}
+
+    async def _select_query(self, table: str, where_clause: Optional[Dict[str, Any]] = None):
+        """Return the reflected table, the parameterized SELECT text and its parameters for READ operations."""
+        reflected = await reflect_table(self.engine, table)
+        where = list(where_clause or {})
+        return reflected, select_sql(reflected, where), bind_values(reflected, "w", where_clause or {})
+
+    async def read_records(self, table: str, where_clause: Optional[Dict[str, Any]] = None, limit: Optional[int] = None,
+                     cursor: Optional[str] = None, order_by: Optional[List[str]] = None, user: Optional[str] = None) -> Dict[str, Any]:
+        """Read records from the specified table, one keyset page at a time when limit or cursor is given."""
         try:
-            query = f"SELECT * FROM {table}"
-            if where_clause:
-                conditions = " AND ".join([f"{k} = '{v}'" if isinstance(v, str) else f"{k} = {v}" for k, v in where_clause.items()])
-                query += f" WHERE {conditions}"
+            reflected, query, params = await self._select_query(table, where_clause)
+        except (SQLAlchemyError, ValueError) as e:
+            return {"success": False, "message": f"Error reading records: {str(e)}"}
+        key = make_cache_key(query, "crud", params, limit, cursor, order_by)
+        return await result_cache.get_or_load(key, [reflected.name], lambda: self._read_records(reflected, query, params, where_clause, limit, cursor, order_by, user),
+                                              refresh=replica_router.is_sticky(user))
+
+    async def _read_records(self, reflected: Table, query: str, params: Dict[str, Any], where_clause: Optional[Dict[str, Any]],
+                            limit: Optional[int], cursor: Optional[str], order_by: Optional[List[str]],
+                            user: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            keys = None
+            if limit is not None or cursor:
+                limit = limit or settings.default_page_size
+                keys = sort_keys(order_by, [column.name for column in reflected.primary_key])
+                fingerprint = query_fingerprint(reflected.fullname, where_clause, keys)
+                values = decode_cursor(cursor, fingerprint, keys) if cursor else None
+                query, page_params = page_query(query, keys, values, limit)
+                params = dict(params, **page_params)
             
-            with self.engine.connect() as connection:
-                result = connection.execute(text(query))
-                data = [dict(row._mapping) for row in result]
-                return {"success": True, "message": f"Retrieved {len(data)} records", "data": data}
-        except SQLAlchemyError as e:
+            async with replica_router.read_engine(user).connect() as connection:
+                result = await connection.execute(typed_text(reflected, query, list(where_clause or {})), params)
+                columns = list(result.keys())
+                rows = [tuple(row) for row in result]
+                next_cursor = None
+                if keys:
+                    rows, next_cursor = paginate(keys, columns, rows, limit, fingerprint)
+                return {"success": True, "message": f"Retrieved {len(rows)} records", "columns": columns, "rows": rows, "next_cursor": next_cursor}
+        except (SQLAlchemyError, ValueError) as e:
             return {"success": False, "message": f"Error reading records: {str(e)}"}
 
-    def update_records(self, table: str, data: Dict[str, Any], where_clause: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def stream_records(self, table: str, where_clause: Optional[Dict[str, Any]] = None, fmt: str = "ndjson",
+                             user: Optional[str] = None, limits: Optional[QueryLimits] = None):
+        """Read records on a server-side cursor and return an async iterator of encoded chunks."""
+        reflected, query, params = await self._select_query(table, where_clause)
+        connection, result = await open_stream(replica_router.read_engine(user), typed_text(reflected, query, list(where_clause or {})),
+                                               params, limits)
+        return encode_stream(connection, result, fmt, limits)
+
+    async def update_records(self, table: str, data: Dict[str, Any], where_clause: Optional[Dict[str, Any]] = None,
+                             user: Optional[str] = None) -> Dict[str, Any]:
         """Update records in the specified table."""
         try:
-            set_clause = ", ".join([f"{k} = '{v}'" if isinstance(v, str) else f"{k} = {v}" for k, v in data.items()])
-            query = f"UPDATE {table} SET {set_clause}"
-            
-            if where_clause:
-                conditions = " AND ".join([f"{k} = '{v}'" if isinstance(v, str) else f"{k} = {v}" for k, v in where_clause.items()])
-                query += f" WHERE {conditions}"
+            reflected = await reflect_table(self.engine, table)
+            statement = update_statement(reflected, list(data), list(where_clause or {}))
+            params = dict(bind_values(reflected, "v", data), **bind_values(reflected, "w", where_clause or {}))
             
-            query += " RETURNING *"
-            
-            with self.engine.connect() as connection:
-                result = connection.execute(text(query))
-                connection.commit()
-                data = [dict(row._mapping) for row in result]
-                return {"success": True, "message": f"Updated {len(data)} records", "data": data}
-        except SQLAlchemyError as e:
+            async with self.engine.connect() as connection:
+                result = await connection.execute(statement, params)
+                await connection.commit()
+                rows = [tuple(row) for row in result]
+                result_cache.invalidate_tables([reflected.name])
+                replica_router.record_write(user)
+                return {"success": True, "message": f"Updated {len(rows)} records", "columns": list(result.keys()), "rows": rows}
+        except (SQLAlchemyError, ValueError) as e:
             return {"success": False, "message": f"Error updating records: {str(e)}"}
 
-    def delete_records(self, table: str, where_clause: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def delete_records(self, table: str, where_clause: Optional[Dict[str, Any]] = None,
+                             user: Optional[str] = None) -> Dict[str, Any]:
         """Delete records from the specified table."""
         try:
-            query = f"DELETE FROM {table}"
+            reflected = await reflect_table(self.engine, table)
+            statement = delete_statement(reflected, list(where_clause or {}))
             
-            if where_clause:
-                conditions = " AND ".join([f"{k} = '{v}'" if isinstance(v, str) else f"{k} = {v}" for k, v in where_clause.items()])
-                query += f" WHERE {conditions}"
-            
-            query += " RETURNING *"
-            
-            with self.engine.connect() as connection:
-                result = connection.execute(text(query))
-                connection.commit()
-                data = [dict(row._mapping) for row in result]
-                return {"success": True, "message": f"Deleted {len(data)} records", "data": data}
-        except SQLAlchemyError as e:
+            async with self.engine.connect() as connection:
+                result = await connection.execute(statement, bind_values(reflected, "w", where_clause or {}))
+                await connection.commit()
+                rows = [tuple(row) for row in result]
+                result_cache.invalidate_tables([reflected.name])
+                replica_router.record_write(user)
+                return {"success": True, "message": f"Deleted {len(rows)} records", "columns": list(result.keys()), "rows": rows}
+        except (SQLAlchemyError, ValueError) as e:
             return {"success": False, "message": f"Error deleting records: {str(e)}"}
 
 # Create CRUD operations instance
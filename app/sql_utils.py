@@ -0,0 +1,143 @@
+from typing import List
+import re
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_WORD_RE = re.compile(r"[a-z_][a-z0-9_$]*")
+
+READ_ONLY_KEYWORDS = ("select", "with", "values", "table", "show", "explain")
+# Words that can make an otherwise read-only statement write (data-modifying CTEs, SELECT INTO)
+WRITE_KEYWORDS = {
+    "insert", "update", "delete", "merge", "into", "truncate", "drop", "alter",
+    "create", "grant", "revoke", "copy", "lock", "call",
+}
+
+# Statements that change the schema the catalog describes
+DDL_KEYWORDS = ("create", "alter", "drop", "comment")
+
+def strip_sql(query: str) -> str:
+    """Remove comments and string literals and lower-case the statement."""
+    query = _COMMENT_RE.sub(" ", query)
+    query = _LITERAL_RE.sub("''", query)
+    return query.strip().rstrip(";").strip().lower()
+
+def split_statements(query: str) -> List[str]:
+    """Split a script on semicolons that are outside string literals."""
+    statements, current, in_literal = [], [], False
+    for char in query:
+        if char == "'":
+            in_literal = not in_literal
+        if char == ";" and not in_literal:
+            statements.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    statements.append("".join(current).strip())
+    return [s for s in statements if s]
+
+def is_read_only(query: str) -> bool:
+    """Return True if the query is a single statement that cannot modify data."""
+    stripped = strip_sql(query)
+    if not stripped or ";" in stripped:
+        return False
+    words = _WORD_RE.findall(stripped)
+    if not words or words[0] not in READ_ONLY_KEYWORDS:
+        return False
+    if words[0] == "explain" and "analyze" in words:
+        return False
+    return not any(word in WRITE_KEYWORDS for word in words)
+
+def is_enclosable(query: str) -> bool:
+    """Return True if the query can be wrapped as in COPY (query) TO STDOUT without closing the parentheses.
+
+    Comments are refused because they could swallow the closing parenthesis.
+    """
+    stripped = _LITERAL_RE.sub("''", query)
+    if "--" in stripped or "/*" in stripped:
+        return False
+    depth = 0
+    for char in stripped:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0
+
+_TABLE_RE = re.compile(r'\b(?:from|join|into|update|table)\s+((?:"[^"]+"|[a-z_][a-z0-9_$]*)(?:\.(?:"[^"]+"|[a-z_][a-z0-9_$]*))?)')
+# Functions whose arguments use FROM without naming a table
+_FROM_FUNCTION_RE = re.compile(r"\b(?:extract|substring|trim|overlay|position)\s*\([^()]*\)")
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+_CALL_RE = re.compile(r"([a-z_][a-z0-9_$]*)\s*\(")
+# Keywords and type names that take parentheses without calling a function
+_PAREN_KEYWORDS = {
+    "select", "from", "join", "on", "using", "where", "and", "or", "not", "in", "exists", "any", "some", "all",
+    "as", "values", "over", "filter", "group", "by", "having", "when", "then", "else", "case", "between", "like",
+    "ilike", "is", "lateral", "row", "array", "with", "recursive", "union", "intersect", "except", "limit",
+    "offset", "distinct", "partition", "window", "rows", "range", "groups", "within", "cast", "extract",
+    "substring", "trim", "overlay", "position", "interval", "numeric", "decimal", "varchar", "char",
+    "character", "varying", "timestamp", "time", "float", "bit", "materialized",
+}
+# Functions whose result depends only on their arguments and the data read
+_STABLE_FUNCTIONS = {
+    "count", "sum", "avg", "min", "max", "stddev", "stddev_pop", "stddev_samp", "variance", "var_pop",
+    "var_samp", "array_agg", "string_agg", "json_agg", "jsonb_agg", "json_object_agg", "bool_and", "bool_or",
+    "every", "percentile_cont", "percentile_disc", "mode", "corr", "covar_pop", "covar_samp",
+    "row_number", "rank", "dense_rank", "percent_rank", "cume_dist", "ntile", "lag", "lead", "first_value",
+    "last_value", "nth_value", "coalesce", "nullif", "greatest", "least", "lower", "upper", "length",
+    "char_length", "octet_length", "concat", "concat_ws", "left", "right", "lpad", "rpad", "ltrim", "rtrim",
+    "btrim", "replace", "split_part", "strpos", "reverse", "repeat", "initcap", "md5", "format", "to_char",
+    "to_number", "to_date", "to_timestamp", "abs", "ceil", "ceiling", "floor", "round", "trunc", "sign", "sqrt",
+    "power", "mod", "exp", "ln", "log", "date_trunc", "date_part", "make_date", "json_build_object",
+    "jsonb_build_object", "to_json", "to_jsonb", "array_length", "unnest", "generate_series",
+    "regexp_replace", "regexp_match", "regexp_matches",
+}
+# Keywords that read the clock
+_CLOCK_KEYWORDS = {"current_date", "current_time", "current_timestamp", "localtime", "localtimestamp"}
+
+def is_deterministic(query: str) -> bool:
+    """Return True if the statement calls only functions known to give the same result for the same data.
+
+    Statements calling anything else (nextval, now, random, pg_terminate_backend, ...)
+    are neither cached nor sent to a replica.
+    """
+    stripped = strip_sql(query)
+    if any(word in _CLOCK_KEYWORDS for word in _WORD_RE.findall(stripped)):
+        return False
+    return all(name in _STABLE_FUNCTIONS or name in _PAREN_KEYWORDS for name in _CALL_RE.findall(stripped))
+
+def is_ddl(query: str) -> bool:
+    """Return True if any statement of the query changes the schema."""
+    return any(strip_sql(statement).startswith(DDL_KEYWORDS) for statement in split_statements(query))
+
+def referenced_tables(query: str) -> List[str]:
+    """Best-effort list of table names a statement reads or writes, without schema prefix."""
+    tables = []
+    stripped = _FROM_FUNCTION_RE.sub(" ", strip_sql(query))
+    for match in _TABLE_RE.findall(stripped):
+        name = match.split(".")[-1].strip('"')
+        if name not in tables and name not in ("select", "lateral", "only"):
+            tables.append(name)
+    return tables
+
+def is_identifier(name: str) -> bool:
+    return bool(_IDENTIFIER_RE.match(name))
+
+def normalize_sql(query: str) -> str:
+    """Canonical form of a statement for cache keys: no comments, collapsed whitespace,
+    lower-cased outside string literals and quoted identifiers."""
+    query = _COMMENT_RE.sub(" ", query).strip().rstrip(";")
+    parts = re.split(r"('(?:[^']|'')*'|\"[^\"]*\")", query)
+    return "".join(
+        part if i % 2 else re.sub(r"\s+", " ", part).lower()
+        for i, part in enumerate(parts)
+    ).strip()
+
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+def fingerprint_sql(query: str) -> str:
+    """Normalized statement with string and numeric literals replaced by placeholders."""
+    normalized = _LITERAL_RE.sub("?", normalize_sql(query))
+    return _NUMBER_RE.sub("?", normalized)
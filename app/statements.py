@@ -0,0 +1,162 @@
+from typing import Any, Dict, Sequence, Tuple
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+import threading
+from sqlalchemy import MetaData, Table, and_, bindparam, delete, insert, literal_column, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.sql.elements import TextClause
+from app.sql_utils import is_identifier
+
+# Reflected tables and compiled statement shapes, keyed by table name
+_tables: Dict[str, Table] = {}
+_statements: Dict[Tuple[Any, ...], Any] = {}
+_lock = threading.Lock()
+_preparer = postgresql.dialect().identifier_preparer
+
+_TRUE = ("true", "t", "yes", "y", "1")
+_FALSE = ("false", "f", "no", "n", "0")
+
+def _parse_bool(value: str) -> bool:
+    word = value.strip().lower()
+    if word not in _TRUE and word not in _FALSE:
+        raise ValueError(f"Invalid boolean value: {value!r}")
+    return word in _TRUE
+
+# JSON strings are converted to the column's Python type because asyncpg binds parameters strictly
+_PARSERS = {
+    datetime: datetime.fromisoformat,
+    date: date.fromisoformat,
+    time: time.fromisoformat,
+    Decimal: Decimal,
+    int: int,
+    float: float,
+    bool: _parse_bool,
+    UUID: UUID,
+}
+
+async def reflect_table(engine: AsyncEngine, name: str) -> Table:
+    """Return the reflected Table for an optionally schema-qualified name, reflecting it once per process.
+
+    Unquoted names fold to lower case as they would in SQL.
+    """
+    if name not in _tables:
+        schema, _, table_name = name.rpartition(".")
+        schema, table_name = [part.lower() if is_identifier(part) else part for part in (schema, table_name)]
+        try:
+            async with engine.connect() as connection:
+                table = await connection.run_sync(
+                    lambda sync_conn: Table(table_name, MetaData(), schema=schema or None, autoload_with=sync_conn)
+                )
+        except NoSuchTableError:
+            raise ValueError(f"Table {name!r} does not exist")
+        with _lock:
+            _tables.setdefault(name, table)
+    return _tables[name]
+
+def forget_tables() -> None:
+    """Drop reflected tables and cached statements, e.g. after a schema change."""
+    with _lock:
+        _tables.clear()
+        _statements.clear()
+
+def _check_columns(table: Table, columns: Sequence[str]) -> None:
+    for column in columns:
+        if column not in table.c:
+            raise ValueError(f"Unknown column {column!r} in table {table.name!r}")
+
+def coerce_value(table: Table, column: str, value: Any) -> Any:
+    """Convert a JSON string to the column's Python type, raising ValueError if it does not parse."""
+    if not isinstance(value, str):
+        return value
+    try:
+        python_type = table.c[column].type.python_type
+    except NotImplementedError:
+        return value
+    try:
+        return parse_value(python_type, value)
+    except (ValueError, ArithmeticError):
+        raise ValueError(f"Invalid value {value!r} for column {column!r}")
+
+def parse_value(python_type: type, value: str) -> Any:
+    """Parse a string as python_type; types without a parser come back unchanged."""
+    parser = _PARSERS.get(python_type)
+    return value if parser is None else parser(value)
+
+def _cached(key: Tuple[Any, ...], build) -> Any:
+    statement = _statements.get(key)
+    if statement is None:
+        statement = build()
+        with _lock:
+            statement = _statements.setdefault(key, statement)
+    return statement
+
+def bind_values(table: Table, prefix: str, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Parameters for a statement shape, named by position so any column name is safe."""
+    return {f"{prefix}{i}": coerce_value(table, column, value) for i, (column, value) in enumerate(values.items())}
+
+def _where(table: Table, columns: Sequence[str]):
+    return and_(*(table.c[column] == bindparam(f"w{i}") for i, column in enumerate(columns)))
+
+def insert_statement(table: Table, columns: Sequence[str]):
+    """Cached INSERT ... RETURNING * for a column set."""
+    _check_columns(table, columns)
+    return _cached(
+        (table.fullname, "insert", tuple(columns)),
+        lambda: insert(table).values({column: bindparam(f"v{i}") for i, column in enumerate(columns)}).returning(*table.c)
+    )
+
+def bulk_insert_statement(table: Table, columns: Sequence[str], conflict: Sequence[str] = ()):
+    """Cached INSERT for executemany, optionally upserting on the conflict columns.
+
+    Rows come back in parameter order with an extra _inserted column that is false
+    for rows an upsert updated.
+    """
+    _check_columns(table, list(columns) + list(conflict))
+    def build():
+        statement = postgresql.insert(table).values({column: bindparam(f"v{i}") for i, column in enumerate(columns)})
+        if conflict:
+            # Updating a key column onto itself keeps RETURNING one row per record when nothing else changes
+            updates = [column for column in columns if column not in conflict] or list(conflict[:1])
+            statement = statement.on_conflict_do_update(
+                index_elements=list(conflict),
+                set_={column: statement.excluded[column] for column in updates}
+            )
+        return statement.returning(*table.c, literal_column("xmax = 0").label("_inserted"), sort_by_parameter_order=True)
+    return _cached((table.fullname, "bulk_insert", tuple(columns), tuple(conflict)), build)
+
+def update_statement(table: Table, columns: Sequence[str], where: Sequence[str]):
+    """Cached UPDATE ... RETURNING * for a SET column set and WHERE column set."""
+    _check_columns(table, list(columns) + list(where))
+    def build():
+        statement = update(table).values({column: bindparam(f"v{i}") for i, column in enumerate(columns)})
+        if where:
+            statement = statement.where(_where(table, where))
+        return statement.returning(*table.c)
+    return _cached((table.fullname, "update", tuple(columns), tuple(where)), build)
+
+def delete_statement(table: Table, where: Sequence[str]):
+    """Cached DELETE ... RETURNING * for a WHERE column set."""
+    _check_columns(table, where)
+    def build():
+        statement = delete(table)
+        if where:
+            statement = statement.where(_where(table, where))
+        return statement.returning(*table.c)
+    return _cached((table.fullname, "delete", tuple(where)), build)
+
+def select_sql(table: Table, where: Sequence[str]) -> str:
+    """SELECT text for a WHERE column set, with :w<n> placeholders so it can be wrapped for paging."""
+    _check_columns(table, where)
+    def build():
+        sql = f"SELECT * FROM {_preparer.format_table(table)}"
+        if where:
+            sql += " WHERE " + " AND ".join(f"{_preparer.quote(column)} = :w{i}" for i, column in enumerate(where))
+        return sql
+    return _cached((table.fullname, "select", tuple(where)), build)
+
+def typed_text(table: Table, sql: str, where: Sequence[str]) -> TextClause:
+    """Attach the WHERE columns' types to the placeholders of a select_sql statement."""
+    return text(sql).bindparams(*(bindparam(f"w{i}", type_=table.c[column].type) for i, column in enumerate(where)))
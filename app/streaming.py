@@ -0,0 +1,80 @@
+from typing import Any, AsyncIterator, Dict, Optional, Union
+import csv
+import io
+import json
+from sqlalchemy import text
+from sqlalchemy.exc import ResourceClosedError
+from sqlalchemy.sql import Executable
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncResult
+from app.config import settings
+from app.governor import apply_limits, limit_partitions, release_limits
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+def sse_event(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def open_stream(engine: AsyncEngine, query: Union[str, Executable], params: Optional[Dict[str, Any]] = None, limits=None):
+    """Execute a query on a server-side cursor and return the open connection and result.
+
+    The statement runs before any bytes are sent so errors can still be reported
+    with a proper status code. The caller owns the connection and must close it.
+    """
+    connection = await engine.connect()
+    try:
+        await apply_limits(connection, limits)
+        result = await connection.stream(
+            text(query) if isinstance(query, str) else query,
+            params or {},
+            execution_options={"yield_per": settings.stream_chunk_size}
+        )
+        try:
+            result.keys()
+        except ResourceClosedError:
+            raise ValueError("Streaming is only supported for queries that return rows")
+        return connection, result
+    except Exception:
+        release_limits(limits)
+        await connection.close()
+        raise
+
+async def iter_ndjson(connection: AsyncConnection, result: AsyncResult, limits=None) -> AsyncIterator[str]:
+    """Yield one JSON object per row, one chunk per fetched partition, up to the row/byte caps."""
+    try:
+        columns = list(result.keys())
+        async for partition in limit_partitions(result.partitions(), limits):
+            yield "".join(
+                json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in partition
+            )
+    finally:
+        release_limits(limits)
+        await connection.close()
+
+async def iter_csv(connection: AsyncConnection, result: AsyncResult, limits=None) -> AsyncIterator[str]:
+    """Yield a CSV header followed by one chunk per fetched partition, up to the row/byte caps."""
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(result.keys())
+        async for partition in limit_partitions(result.partitions(), limits):
+            writer.writerows(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        release_limits(limits)
+        await connection.close()
+
+def encode_stream(connection: AsyncConnection, result: AsyncResult, fmt: str, limits=None) -> AsyncIterator[str]:
+    """Return the chunk iterator for the requested streaming format."""
+    if fmt == "csv":
+        return iter_csv(connection, result, limits)
+    return iter_ndjson(connection, result, limits)
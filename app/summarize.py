@@ -0,0 +1,168 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import json
+import numpy as np
+from app.nl_prompt import estimate_tokens
+
+_QUANTILES = (0.25, 0.5, 0.75)
+# Longest string kept in a sample row or top-k entry
+_MAX_TEXT = 80
+
+def _short(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > _MAX_TEXT:
+        return value[:_MAX_TEXT] + "..."
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _column_kind(values: Sequence[Any]) -> str:
+    types = set(map(type, values)) - {type(None)}
+    if not types:
+        return "empty"
+    if all(issubclass(t, (int, float, Decimal)) and not issubclass(t, bool) for t in types):
+        return "numeric"
+    if all(issubclass(t, (datetime, date)) for t in types):
+        return "temporal"
+    return "categorical"
+
+def _object_array(values: Sequence[Any]) -> np.ndarray:
+    # fromiter keeps list or tuple values as single elements
+    return np.fromiter(values, dtype=object, count=len(values))
+
+def _numeric_stats(present: np.ndarray) -> Dict[str, Any]:
+    if present.size == 0:
+        return {}
+    quantiles = np.quantile(present, _QUANTILES)
+    return {
+        "min": float(present.min()),
+        "max": float(present.max()),
+        "mean": round(float(present.mean()), 6),
+        "std": round(float(present.std()), 6),
+        "quantiles": {f"p{int(q * 100)}": round(float(v), 6) for q, v in zip(_QUANTILES, quantiles)},
+    }
+
+def _naive_utc(value: date) -> datetime:
+    if not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def _temporal_stats(present: np.ndarray) -> Dict[str, Any]:
+    try:
+        first, last = min(present), max(present)
+        days = (last - first).total_seconds() / 86400
+    except TypeError:
+        # Dates, naive and aware timestamps only compare once all are naive UTC datetimes
+        normalized = [_naive_utc(value) for value in present]
+        first, last = min(normalized), max(normalized)
+        days = (last - first).total_seconds() / 86400
+    return {"min": first, "max": last, "range_days": round(days, 3)}
+
+def _categorical_stats(text: np.ndarray, top_k: int) -> Dict[str, Any]:
+    distinct, counts = np.unique(text, return_counts=True)
+    order = np.argsort(-counts, kind="stable")[:top_k]
+    return {
+        "distinct": int(len(distinct)),
+        "top": [{"value": _short(distinct[i]), "count": int(counts[i])} for i in order],
+    }
+
+def _strata(texts: List[Optional[np.ndarray]], size: int) -> Optional[List[np.ndarray]]:
+    """Row numbers grouped by the first categorical column with at most size distinct values."""
+    for keys in texts:
+        if keys is None:
+            continue
+        distinct, inverse = np.unique(keys, return_inverse=True)
+        if len(distinct) <= size:
+            order = np.argsort(inverse, kind="stable")
+            return np.split(order, np.cumsum(np.bincount(inverse))[:-1])
+    return None
+
+def _sample_indices(strata: Optional[List[np.ndarray]], row_count: int, size: int) -> List[int]:
+    """Round-robin over the strata, each in result order; rows spread evenly over the result without strata."""
+    if row_count <= size:
+        return list(range(row_count))
+    if strata is None:
+        return sorted(set(np.linspace(0, row_count - 1, size).round().astype(int).tolist()))
+    picked: List[int] = []
+    depth = 0
+    while len(picked) < size:
+        for stratum in strata:
+            if depth < len(stratum) and len(picked) < size:
+                picked.append(int(stratum[depth]))
+        depth += 1
+    return sorted(picked)
+
+def _first_kinds(summary: Dict[str, Any], stats: Dict[str, Dict[str, Any]], columns: List[str], kept: int) -> Dict[str, Any]:
+    return dict(summary, columns={column: {"kind": stats[column]["kind"]} for column in columns[:kept]},
+                omitted_columns=len(columns) - kept)
+
+def summarize_result(columns: List[str], rows: List[Tuple[Any, ...]], token_budget: int,
+                     sample_rows: int, top_k: int) -> Dict[str, Any]:
+    """Per-column statistics and a small stratified sample of a result, within token_budget.
+
+    Numeric columns get min/max/mean/std and quartiles, date and time columns their
+    range, other columns their distinct count and top_k values. The sample, the top-k
+    lists and then the column details shrink until the JSON form fits the budget;
+    columns left out entirely are counted in omitted_columns.
+    """
+    columns_values = list(zip(*rows)) if rows else [() for _ in columns]
+    kinds = [_column_kind(values) for values in columns_values]
+    stats: Dict[str, Dict[str, Any]] = {}
+    # String forms of the categorical columns, shared by their stats and the strata
+    texts: List[Optional[np.ndarray]] = []
+    for column, values, kind in zip(columns, columns_values, kinds):
+        array = _object_array(values)
+        nulls = np.equal(array, None)
+        details: Dict[str, Any] = {}
+        text = None
+        if kind == "numeric":
+            numbers = np.where(nulls, np.nan, array).astype(float)
+            # NaN counts as null; infinities are counted but kept out of the statistics
+            nulls = np.isnan(numbers)
+            infinite = np.isinf(numbers)
+            details = _numeric_stats(numbers[np.isfinite(numbers)])
+            if infinite.any():
+                details["infinite"] = int(infinite.sum())
+        elif kind == "temporal":
+            details = _temporal_stats(array[~nulls])
+        elif kind == "categorical":
+            text = np.frompyfunc(str, 1, 1)(array)
+            details = _categorical_stats(text[~nulls], top_k)
+        texts.append(text)
+        null_count = int(nulls.sum())
+        stats[column] = {"kind": kind, "count": len(values) - null_count, "nulls": null_count, **details}
+
+    strata = _strata(texts, sample_rows) if len(rows) > sample_rows else None
+    size = sample_rows
+    while True:
+        indices = _sample_indices(strata, len(rows), size)
+        summary = {
+            "row_count": len(rows),
+            "columns": stats,
+            "sample": [dict(zip(columns, (_short(value) for value in rows[i]))) for i in indices],
+        }
+        if estimate_tokens(json.dumps(summary, default=str)) <= token_budget:
+            return summary
+        if size > 0:
+            size //= 2
+            continue
+        # Still too large: trim the top-k lists, then drop column details
+        longest = max((entry.get("top", []) for entry in stats.values()), key=len, default=[])
+        if len(longest) > 1:
+            for entry in stats.values():
+                if "top" in entry:
+                    entry["top"] = entry["top"][:max(len(longest) // 2, 1)]
+            continue
+        summary["columns"] = {column: {"kind": entry["kind"]} for column, entry in stats.items()}
+        summary["truncated"] = True
+        if estimate_tokens(json.dumps(summary, default=str)) <= token_budget:
+            return summary
+        # Too many columns even for their kinds: keep as many of the first ones as fit
+        low, high = 0, len(columns) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate_tokens(json.dumps(_first_kinds(summary, stats, columns, middle), default=str)) <= token_budget:
+                low = middle
+            else:
+                high = middle - 1
+        return _first_kinds(summary, stats, columns, low)